@@ -0,0 +1,121 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import islice
+from typing import Iterable, Iterator, List, NamedTuple, Tuple, Union
+
+import django
+
+from chess.book import OpeningBook, opening_book
+from chess.engine import Search
+from chess.game_logic import Board
+from chess.models import ChessMatchModel
+from chess.persistence import load_board
+from chess.tablebase import Tablebases, tablebases
+from chess.transposition import TranspositionTable
+
+# Batch analysis of many positions, e.g. of every game overnight. Positions are
+# split into chunks that are searched by a pool of worker processes, one per core by
+# default, and results are yielded as soon as their chunk is done.
+
+
+class Analysis(NamedTuple):
+    key: str  # the FEN or match id the position was given by
+    fen: str
+    best_move: Union[str, None]  # UCI notation, None if the game is over
+    score: int  # centipawns from the view of the side to move
+    depth: int
+    legal_moves: int
+    error: Union[str, None] = None  # why the position could not be analysed
+    book_moves: Tuple[str, ...] = ()  # of the opening book, most played first
+
+
+def analyse_position(
+    key: str,
+    fen: str,
+    depth: int,
+    time_limit: Union[float, None],
+    table: TranspositionTable,
+    book: Union[OpeningBook, None],
+    endgames: Union[Tablebases, None],
+) -> Analysis:
+    board = Board.fromFen(fen)
+
+    legal_moves = len(board.generateLegalMoves())
+    book_moves = tuple(
+        move.uci() for move, weight in (book.moves(board) if book else ())
+    )
+    result = Search(board, table, endgames).run(depth, time_limit)
+    return Analysis(
+        key,
+        fen,
+        result.move.uci() if result.move else None,
+        result.score,
+        result.depth,
+        legal_moves,
+        book_moves=book_moves,
+    )
+
+
+def analyse_chunk(
+    positions: List[Tuple[str, str]], depth: int, time_limit: Union[float, None]
+) -> List[Analysis]:
+    # runs in a worker process, the chunk shares one transposition table
+    table = TranspositionTable()
+    book = opening_book()
+    endgames = tablebases()
+    results = list()
+
+    for key, fen in positions:
+        try:
+            results.append(
+                analyse_position(key, fen, depth, time_limit, table, book, endgames)
+            )
+        except Exception as e:  # one broken position must not stop the batch
+            results.append(Analysis(key, fen, None, 0, 0, 0, str(e)))
+
+    return results
+
+
+def analyse_positions(
+    positions: Iterable[Tuple[str, str]],
+    depth: int = 4,
+    time_limit: Union[float, None] = 1.0,
+    workers: Union[int, None] = None,
+    chunk_size: int = 16,
+) -> Iterator[Analysis]:
+    # Analyses (key, FEN) pairs in parallel. Results come in the order their chunks
+    # finish. Only a few chunks per worker are read ahead, so the input can be a
+    # stream of any length.
+    positions = iter(positions)
+    workers = workers or os.cpu_count() or 1
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        ahead = 2 * workers
+        pending = set()
+
+        while True:
+            while len(pending) < ahead:
+                chunk = list(islice(positions, chunk_size))
+                if not chunk:
+                    break
+                pending.add(pool.submit(analyse_chunk, chunk, depth, time_limit))
+
+            if not pending:
+                return
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield from future.result()
+
+
+def match_positions(
+    match_ids: Union[Iterable[int], None] = None, batch_size: int = 500
+) -> Iterator[Tuple[str, str]]:
+    # (match id, FEN) of the current position of the matches, of all if no ids are
+    # given
+    matches = ChessMatchModel.objects.filter(pooled=False).order_by("id")
+    if match_ids is not None:
+        matches = matches.filter(id__in=list(match_ids))
+
+    for chess_match in matches.iterator(chunk_size=batch_size):
+        yield str(chess_match.id), load_board(chess_match).toFen()
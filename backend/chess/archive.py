@@ -0,0 +1,175 @@
+from typing import Iterable, Iterator, List, NamedTuple, Tuple, Union
+
+from django.db import transaction
+from django.db.models import Max, Prefetch, QuerySet
+
+from chess.game_logic import EMPTY, PIECE_CODES, START_FEN, Board, Move, pieceTypeOf
+from chess.models import ChessMatchModel, ChessPieceColor, MoveModel
+from chess.persistence import load_snapshot
+from chess.pgn import (
+    RESULTS,
+    PgnGame,
+    parse_san,
+    start_board,
+    write_game,
+    write_san,
+)
+
+# Bulk import and export of games in PGN, e.g. of public game databases. Games are
+# streamed in both directions, so memory stays bounded by the batch size whatever the
+# size of the archive.
+
+
+class Imported(NamedTuple):
+    number: int  # of the game in the input, from 1
+    match_id: Union[int, None]  # None if the game has been rejected
+    error: Union[str, None] = None
+
+
+def build_match(
+    match_id: int, game: PgnGame
+) -> Tuple[ChessMatchModel, List[MoveModel]]:
+    # The match and move log of a game. Raises ValueError for start positions that
+    # cannot occur in a game and at the first illegal move.
+    board = start_board(game)
+    start = board.pack(), board.turn
+    standard = board.toFen() == START_FEN
+
+    moves = list()
+    for san in game.moves:
+        move = parse_san(board, san)
+        board.makeMove(move)
+        moves.append(
+            MoveModel(
+                chess_match_id=match_id,
+                ply=board.ply,
+                source=move.source,
+                target=move.target,
+                promotion=pieceTypeOf(move.promotion) if move.promotion else None,
+            )
+        )
+
+    # The snapshot of games from the starting position is the final one, so loading
+    # them replays nothing. Games from another position keep it as their snapshot,
+    # since it could not be told from the moves when exporting them.
+    position, turn = (board.pack(), board.turn) if standard else start
+    result = game.result if game.result in RESULTS and game.result != "*" else None
+    return (
+        ChessMatchModel(
+            id=match_id, position=position, turn=turn, archived=True, result=result
+        ),
+        moves,
+    )
+
+
+def write_batch(matches: List[ChessMatchModel], moves: List[MoveModel]):
+    with transaction.atomic():
+        ChessMatchModel.objects.bulk_create(matches)
+        MoveModel.objects.bulk_create(moves, batch_size=1000)
+
+
+def import_games(
+    games: Iterable[PgnGame],
+    first_id: Union[int, None] = None,
+    batch_size: int = 500,
+) -> Iterator[Imported]:
+    # Stores the games as archived matches with consecutive ids from first_id, by
+    # default after the highest id in use. The matches of batch_size games and their
+    # moves are written with a few INSERTs per transaction, games that cannot be
+    # replayed are skipped. Results are yielded once their batch has been written.
+    if first_id is None:
+        first_id = (ChessMatchModel.objects.aggregate(Max("id"))["id__max"] or 0) + 1
+
+    match_id = first_id
+    matches: List[ChessMatchModel] = []
+    moves: List[MoveModel] = []
+    results: List[Imported] = []
+
+    for number, game in enumerate(games, 1):
+        try:
+            chess_match, game_moves = build_match(match_id, game)
+        except Exception as e:  # one broken game must not stop the import
+            results.append(Imported(number, None, str(e)))
+            continue
+
+        matches.append(chess_match)
+        moves.extend(game_moves)
+        results.append(Imported(number, match_id))
+        match_id += 1
+
+        if len(matches) >= batch_size:
+            write_batch(matches, moves)
+            yield from results
+            matches, moves, results = [], [], []
+
+    if matches:
+        write_batch(matches, moves)
+    yield from results
+
+
+def outcome(board: Board) -> str:
+    if board.generateLegalMoves():
+        return "*"
+    if board.isInCheck():
+        return "1-0" if board.turn == ChessPieceColor.BLACK else "0-1"
+    return "1/2-1/2"
+
+
+def match_pgn(chess_match: ChessMatchModel) -> str:
+    # the match as a PGN game, its moves must have been fetched ordered by ply
+    logged = list(chess_match.moves.all())
+    board = load_snapshot(chess_match)
+
+    first_ply = logged[0].ply if logged else board.ply + 1
+    if first_ply != board.ply + 1:
+        if first_ply == 1:
+            board = Board.fromFen(START_FEN)
+        else:
+            # the start of the game is unknown, only the current position is kept
+            for entry in logged:
+                if entry.ply > board.ply:
+                    board.makeMove(
+                        Move(
+                            entry.source,
+                            entry.target,
+                            PIECE_CODES.get(entry.promotion, EMPTY),
+                        )
+                    )
+            logged = []
+
+    fen, start_ply = board.toFen(), board.ply
+    moves = list()
+    for entry in logged:
+        move = Move(entry.source, entry.target, PIECE_CODES.get(entry.promotion, EMPTY))
+        moves.append(write_san(board, move))
+        board.makeMove(move)
+    # games decided by resignation, agreement or time keep the result they were
+    # imported with
+    result = chess_match.result or outcome(board)
+
+    headers = {
+        "Event": f"Match {chess_match.id}",
+        "Site": "?",
+        "Date": chess_match.last_accessed.strftime("%Y.%m.%d"),
+        "Round": "-",
+        "White": "?",
+        "Black": "?",
+        "Result": result,
+    }
+    if fen != START_FEN:
+        headers["SetUp"] = "1"
+        headers["FEN"] = fen
+    return write_game(headers, moves, result, start_ply)
+
+
+def export_games(
+    matches: Union[QuerySet, None] = None, chunk_size: int = 500
+) -> Iterator[str]:
+    # The matches as PGN games, all by default. They are fetched chunk_size at a
+    # time together with their moves, so any number of matches can be exported.
+    queryset = matches if matches is not None else ChessMatchModel.objects.all()
+    queryset = queryset.order_by("id").prefetch_related(
+        Prefetch("moves", queryset=MoveModel.objects.order_by("ply"))
+    )
+    for chess_match in queryset.iterator(chunk_size=chunk_size):
+        yield match_pgn(chess_match)
@@ -0,0 +1,91 @@
+from typing import Final, Tuple
+
+# Lookup tables for move generation, computed once at import.
+# Squares are numbered like Board fields: 0 is the top left corner (a8), 63 the bottom right (h1).
+
+NORTH: Final = 0
+EAST: Final = 1
+SOUTH: Final = 2
+WEST: Final = 3
+NORTH_EAST: Final = 4
+NORTH_WEST: Final = 5
+SOUTH_EAST: Final = 6
+SOUTH_WEST: Final = 7
+
+# (row, column) step of each direction
+STEPS: Final = (
+    (-1, 0),
+    (0, 1),
+    (1, 0),
+    (0, -1),
+    (-1, 1),
+    (-1, -1),
+    (1, 1),
+    (1, -1),
+)
+
+ROOK_DIRECTIONS: Final = (NORTH, EAST, SOUTH, WEST)
+BISHOP_DIRECTIONS: Final = (NORTH_EAST, NORTH_WEST, SOUTH_EAST, SOUTH_WEST)
+QUEEN_DIRECTIONS: Final = ROOK_DIRECTIONS + BISHOP_DIRECTIONS
+
+KNIGHT_STEPS: Final = (
+    (-2, -1),
+    (-2, 1),
+    (-1, -2),
+    (-1, 2),
+    (1, -2),
+    (1, 2),
+    (2, -1),
+    (2, 1),
+)
+
+WHITE_PAWN_STEPS: Final = ((-1, -1), (-1, 1))
+BLACK_PAWN_STEPS: Final = ((1, -1), (1, 1))
+
+
+def on_board(row: int, col: int) -> bool:
+    return 0 <= row < 8 and 0 <= col < 8
+
+
+def ray(pos: int, step: Tuple[int, int]) -> Tuple[int, ...]:
+    row, col = divmod(pos, 8)
+    fields = list()
+
+    row, col = row + step[0], col + step[1]
+    while on_board(row, col):
+        fields.append(row * 8 + col)
+        row, col = row + step[0], col + step[1]
+
+    return tuple(fields)
+
+
+def leaps(pos: int, steps) -> Tuple[int, ...]:
+    row, col = divmod(pos, 8)
+    return tuple(
+        (row + d_row) * 8 + col + d_col
+        for d_row, d_col in steps
+        if on_board(row + d_row, col + d_col)
+    )
+
+
+# RAYS[direction][pos] lists the squares from pos to the border, nearest first
+RAYS: Final = tuple(tuple(ray(pos, step) for pos in range(64)) for step in STEPS)
+
+
+def rays(directions) -> Tuple[Tuple[Tuple[int, ...], ...], ...]:
+    # per square, the non-empty rays of the given directions
+    return tuple(
+        tuple(RAYS[d][pos] for d in directions if RAYS[d][pos]) for pos in range(64)
+    )
+
+
+ROOK_RAYS: Final = rays(ROOK_DIRECTIONS)
+BISHOP_RAYS: Final = rays(BISHOP_DIRECTIONS)
+QUEEN_RAYS: Final = rays(QUEEN_DIRECTIONS)
+
+KNIGHT_TARGETS: Final = tuple(leaps(pos, KNIGHT_STEPS) for pos in range(64))
+KING_TARGETS: Final = tuple(leaps(pos, STEPS) for pos in range(64))
+
+# squares a pawn standing on pos attacks, by color
+WHITE_PAWN_ATTACKS: Final = tuple(leaps(pos, WHITE_PAWN_STEPS) for pos in range(64))
+BLACK_PAWN_ATTACKS: Final = tuple(leaps(pos, BLACK_PAWN_STEPS) for pos in range(64))
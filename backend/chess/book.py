@@ -0,0 +1,129 @@
+import mmap
+import os
+import random
+import struct
+from typing import Dict, Final, List, Tuple, Union
+
+from django.conf import settings
+
+from chess.game_logic import Board, Move
+
+# Opening books: the moves played from known positions, looked up by the Zobrist hash
+# of the position. A book file is a sorted array of fixed-width entries that is
+# mapped into memory and binary searched, so opening it costs nothing however big the
+# book is and all processes reading it share the same pages.
+
+# hash, move (source | target << 6 | promotion << 12) and weight, big-endian
+ENTRY: Final = struct.Struct(">QHH")
+MAX_WEIGHT: Final = 0xFFFF
+
+
+def encode_move(move: Move) -> int:
+    return move.source | move.target << 6 | move.promotion << 12
+
+
+def decode_move(value: int) -> Move:
+    return Move(value & 63, value >> 6 & 63, value >> 12)
+
+
+class OpeningBook:
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as file:
+            size = os.fstat(file.fileno()).st_size
+            if size % ENTRY.size:
+                raise ValueError(f"{path} is not an opening book.")
+            # the mapping stays valid after the file is closed, an empty file
+            # cannot be mapped
+            self.data = (
+                mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+            )
+        self.size = size // ENTRY.size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def key(self, index: int) -> int:
+        return ENTRY.unpack_from(self.data, index * ENTRY.size)[0]
+
+    def entries(self, key: int) -> List[Tuple[Move, int]]:
+        # the moves stored for the hash with their weights
+        low, high = 0, self.size
+        while low < high:  # the first entry with a hash not below key
+            middle = (low + high) // 2
+            if self.key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        entries = list()
+        for index in range(low, self.size):
+            entry_key, move, weight = ENTRY.unpack_from(self.data, index * ENTRY.size)
+            if entry_key != key:
+                break
+            entries.append((decode_move(move), weight))
+        return entries
+
+    def moves(self, board: Board) -> List[Tuple[Move, int]]:
+        # the book moves of the board, heaviest first. Moves that are not legal on
+        # the board, e.g. from a hash collision, are left out.
+        entries = self.entries(board.hash)
+        if not entries:
+            return entries
+
+        legal = set(board.generateLegalMoves())
+        return sorted(
+            ((move, weight) for move, weight in entries if move in legal),
+            key=lambda entry: entry[1],
+            reverse=True,
+        )
+
+    def choose(
+        self, board: Board, rng: Union[random.Random, None] = None
+    ) -> Union[Move, None]:
+        # a book move picked with a probability proportional to its weight
+        moves = self.moves(board)
+        if not moves:
+            return None
+        return (rng or random).choices(
+            [move for move, weight in moves], [weight for move, weight in moves]
+        )[0]
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+
+def write_book(path: str, counts: Dict[Tuple[int, Move], int]):
+    # Writes the moves counted per (hash, move) as a book. Weights are capped at
+    # MAX_WEIGHT. The file is replaced atomically, so readers that have it mapped
+    # keep their version.
+    entries = sorted(
+        (key, encode_move(move), min(count, MAX_WEIGHT))
+        for (key, move), count in counts.items()
+    )
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        for entry in entries:
+            file.write(ENTRY.pack(*entry))
+    os.replace(temporary, path)
+
+
+_book: Union[OpeningBook, None] = None
+
+
+def opening_book() -> Union[OpeningBook, None]:
+    # the book of the CHESS_OPENING_BOOK setting, opened on first use, None if there
+    # is no book
+    global _book
+    path = getattr(settings, "CHESS_OPENING_BOOK", None)
+    if not path or not os.path.exists(path):
+        return None
+    if _book is None or _book.path != path:
+        _book = OpeningBook(path)
+    return _book
+
+
+def book_move(board: Board) -> Union[Move, None]:
+    book = opening_book()
+    return book.choose(board) if book is not None else None
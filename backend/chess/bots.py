@@ -0,0 +1,90 @@
+import asyncio
+import logging
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Union
+
+import django
+from django.conf import settings
+
+from chess.book import book_move
+from chess.engine import search_packed
+from chess.game_logic import CASTLINGS, KING, TYPE_MASK, Board, Move
+from chess.tablebase import tablebases
+
+# Games against the computer. The engine searches in a pool of worker processes so
+# that its CPU time never blocks the sockets on the event loop, and its move is
+# broadcast like any other interaction.
+
+_executor: Union[ProcessPoolExecutor, None] = None
+
+
+def executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=getattr(settings, "CHESS_ENGINE_WORKERS", None) or None,
+            initializer=django.setup,
+        )
+    return _executor
+
+
+def interaction_target(board: Board, move: Move) -> int:
+    # clients castle by moving the king onto its rook
+    if board.squares[move.source] & TYPE_MASK == KING:
+        for king, king_target, rook, rook_target in CASTLINGS.values():
+            if (move.source, move.target) == (king, king_target):
+                return rook
+    return move.target
+
+
+async def play_engine_move(room):
+    # searches and plays the engine's move if it is the engine's turn in the room
+    if room.engine is None or room.engine != room.board.turn or room.thinking:
+        return
+
+    # book and tablebase moves are looked up in no time, no worker is needed for them
+    move = book_move(room.board)
+    endgames = tablebases()
+    if move is None and endgames is not None:
+        move = endgames.best_move(room.board)
+    if move is None:
+        move = await search_move(room)
+    if move is None:
+        return
+
+    data = {
+        "color": room.engine,
+        "source": move.source,
+        "target": interaction_target(room.board, move),
+    }
+    move_id = uuid.uuid4().hex
+    if room.play(move, move_id):
+        await room.announce(move_id, move, data)
+
+
+async def search_move(room) -> Union[Move, None]:
+    # the move the engine finds in a worker, None if there is none or the position
+    # changed during the search
+    time_limit = getattr(settings, "CHESS_ENGINE_TIME_LIMIT", 2.0)
+    seq = room.seq
+    room.thinking = True
+    try:
+        result = await asyncio.wait_for(
+            asyncio.get_running_loop().run_in_executor(
+                executor(),
+                search_packed,
+                room.board.pack(),
+                getattr(settings, "CHESS_ENGINE_DEPTH", 5),
+                time_limit,
+            ),
+            # the search stops itself, this only guards against a stuck worker
+            time_limit + 5,
+        )
+    except Exception:
+        logging.exception("The engine failed to move in room %s.", room.match_id)
+        return None
+    finally:
+        room.thinking = False
+
+    return result.move if room.seq == seq else None
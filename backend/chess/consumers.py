@@ -1,158 +1,188 @@
+import asyncio
 import json
 import logging
-from datetime import datetime
-
-from channels.generic.websocket import WebsocketConsumer
-from channels.exceptions import DenyConnection
-from chess.models import ChessMatchModel, ChessPieceColor
-from chess.serializers import ChessMatchSerializer
-from asgiref.sync import async_to_sync
-from .game_logic import Board
-
-from chess.models import ChessMatchModel, ChessPieceType, ChessPieceColor
-from chess.serializers import ChessMatchSerializer
-
-default_board_pieces = (
-    [
-        {"pos": pos, "type": ChessPieceType.PAWN, "color": ChessPieceColor.BLACK}
-        for pos in range(8, 16)
-    ]
-    + [
-        {"pos": pos, "type": ChessPieceType.PAWN, "color": ChessPieceColor.WHITE}
-        for pos in range(48, 56)
-    ]
-    + [
-        {"pos": pos, "type": ChessPieceType.ROOK, "color": ChessPieceColor.BLACK}
-        for pos in (0, 7)
-    ]
-    + [
-        {"pos": pos, "type": ChessPieceType.ROOK, "color": ChessPieceColor.WHITE}
-        for pos in (56, 63)
-    ]
-    + [
-        {
-            "pos": pos,
-            "type": ChessPieceType.KNIGHT,
-            "color": ChessPieceColor.BLACK,
-        }
-        for pos in (1, 6)
-    ]
-    + [
-        {
-            "pos": pos,
-            "type": ChessPieceType.KNIGHT,
-            "color": ChessPieceColor.WHITE,
-        }
-        for pos in (57, 62)
-    ]
-    + [
-        {
-            "pos": pos,
-            "type": ChessPieceType.BISHOP,
-            "color": ChessPieceColor.BLACK,
-        }
-        for pos in (2, 5)
-    ]
-    + [
-        {
-            "pos": pos,
-            "type": ChessPieceType.BISHOP,
-            "color": ChessPieceColor.WHITE,
-        }
-        for pos in (58, 61)
-    ]
-    + [{"pos": 3, "type": ChessPieceType.QUEEN, "color": ChessPieceColor.BLACK}]
-    + [{"pos": 59, "type": ChessPieceType.QUEEN, "color": ChessPieceColor.WHITE}]
-    + [{"pos": 4, "type": ChessPieceType.KING, "color": ChessPieceColor.BLACK}]
-    + [{"pos": 60, "type": ChessPieceType.KING, "color": ChessPieceColor.WHITE}]
-)
-
-
-class ChessConsumer(WebsocketConsumer):
-    def connect(self):
+import uuid
+from urllib.parse import parse_qs
+
+from channels.generic.websocket import AsyncWebsocketConsumer
+from channels.db import database_sync_to_async
+from django.db import IntegrityError
+from chess.bots import play_engine_move
+from chess.game_logic import EMPTY, PIECE_CODES
+from chess.models import ChessMatchModel
+from chess.fanout import Frame
+from chess.protocol import BINARY_SUBPROTOCOL, decode_message, encode_state
+from chess.provisioning import claim_pooled_match, create_match
+from .persistence import load_board, touches, write_behind
+from .rooms import rooms
+
+
+class ChessConsumer(AsyncWebsocketConsumer):
+    # Moves are validated and applied on the room's in-memory board on the event loop,
+    # the database is only used through database_sync_to_async when loading the match
+    # and writing moves. Messages are JSON unless the client negotiated the binary
+    # subprotocol of chess.protocol. Moves reach the socket through the room's
+    # chess.fanout, not through a channel group of its own.
+
+    async def connect(self):
         self.room_name = self.scope["url_route"]["kwargs"]["room_name"]
-        self.layer_name = f"chess_{self.room_name}"
 
-        try:  # load match
-            chess_match = ChessMatchModel.objects.get(id=self.room_name)
-            chess_match.last_accessed = datetime.now()
-            chess_match.save()
-            serializer = ChessMatchSerializer(chess_match)
+        # a room still in memory has been loaded before, joining it needs no database
+        chess_match = None
+        room = rooms.get(int(self.room_name))
+        if room is not None:
+            match_id, board = room.match_id, room.board
+        else:
+            chess_match = await self.load_match()
+            match_id = chess_match.id
+            room = rooms.get(match_id)
+            board = (
+                room.board
+                if room is not None
+                else await database_sync_to_async(load_board)(chess_match)
+            )
 
-        except ChessMatchModel.DoesNotExist:  # register match
-            data = {"id": self.room_name, "pieces": default_board_pieces}
-            serializer = ChessMatchSerializer(data=data)
-            if serializer.is_valid():
-                serializer.save()
-                chess_match = serializer.instance
-            else:
-                logging.error(serializer.errors)
-                raise DenyConnection("Room could not be created.")
-
-        self.board = Board(chess_match)
-        async_to_sync(self.channel_layer.group_add)(self.layer_name, self.channel_name)
-        self.accept()
-        self.send(
+        # may evict other rooms, which writes their pending moves
+        self.room = await database_sync_to_async(rooms.acquire)(match_id, lambda: board)
+        self.board = self.room.board
+        if chess_match is not None:
+            self.room.set_seats(chess_match.white, chess_match.black)
+            self.room.engine = chess_match.engine
+        self.seats_changed()
+        touches.touch(match_id)
+
+        self.binary = BINARY_SUBPROTOCOL in self.scope.get("subprotocols", ())
+        await self.accept(BINARY_SUBPROTOCOL if self.binary else None)
+        self.resume()
+
+        self.start_engine()  # e.g. the engine plays white
+
+    def start_engine(self):
+        # Plays the engine's move in the background if it is its turn. The task is
+        # kept by the room, so that it is not collected while running.
+        if self.room.engine is None:
+            return
+
+        task = asyncio.ensure_future(play_engine_move(self.room))
+        self.room.engine_tasks.add(task)
+        task.add_done_callback(self.engine_move_done)
+
+    def engine_move_done(self, task: asyncio.Task):
+        self.room.engine_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(
+                "The engine failed to move in room %s.",
+                self.room.match_id,
+                exc_info=task.exception(),
+            )
+
+    def seats_changed(self):
+        # the color this connection plays, kept up to date by the room's fanout
+        self.color = self.room.seat(self.scope["session"].session_key)
+
+    def resume(self):
+        # Subscribes to the moves of the room, after sending a reconnecting client the
+        # moves after its last_seq, or the whole position if it is new or missed more
+        # moves than the room remembers.
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        missed = None
+        if query.get("last_seq", [""])[0].isdigit():
+            missed = self.room.missed(int(query["last_seq"][0]))
+
+        delivery = self.room.fanout.subscribe(self, resync=missed is None)
+        for seq, data in missed or ():
+            delivery.push(Frame(seq, data))
+
+    async def send_state(self) -> int:
+        seq = self.room.seq
+        if self.binary:
+            await self.send(bytes_data=encode_state(self.board, seq))
+            return seq
+
+        await self.send(
             json.dumps(
                 {
                     "type": "state",
                     "data": {
-                        "pieces": serializer.data["pieces"],
-                        "turn": serializer.data["turn"],
+                        "pieces": self.board.pieceList(),
+                        "turn": self.board.turn,
                     },
+                    "seq": seq,
                 }
             )
         )
+        return seq
 
-    def disconnect(self, close_code):
-        async_to_sync(self.channel_layer.group_discard)(
-            self.layer_name, self.channel_name
-        )
+    async def send_frame(self, frame: Frame):
+        if self.binary:
+            await self.send(bytes_data=frame.binary)
+        else:
+            await self.send(frame.text)
 
-    def receive_interaction_message(self, msg):
-        chess_match = ChessMatchModel.objects.get(id=self.room_name)
-        piece = self.board.getPiece(msg["source"])
-        player_color = None
-
-        if self.scope["session"].session_key == chess_match.white:
-            player_color = ChessPieceColor.WHITE
-        elif self.scope["session"].session_key == chess_match.black:
-            player_color = ChessPieceColor.BLACK
-
-        if (
-            piece is None
-            or piece.color != player_color
-            or player_color != chess_match.turn
-        ):
+    @database_sync_to_async
+    def load_match(self) -> ChessMatchModel:
+        try:  # load match
+            chess_match = ChessMatchModel.objects.get(id=self.room_name)
+
+            if chess_match.pooled:
+                chess_match = claim_pooled_match(chess_match.id) or chess_match
+
+        except ChessMatchModel.DoesNotExist:  # register match
+            try:
+                chess_match = create_match(self.room_name)
+            except IntegrityError:  # registered by a concurrent connection
+                chess_match = ChessMatchModel.objects.get(id=self.room_name)
+
+        return chess_match
+
+    async def disconnect(self, close_code):
+        if hasattr(self, "room"):
+            self.room.fanout.unsubscribe(self)
+            await database_sync_to_async(self.leave_room)()
+            if self.room.connections == 0:  # nobody is left to see the engine's move
+                for task in list(self.room.engine_tasks):
+                    task.cancel()
+
+    def leave_room(self):
+        write_behind.flush(self.room.match_id)
+        rooms.release(self.room)
+
+    async def receive_interaction_message(self, msg):
+        # rejected without touching the database
+        player_color = self.color
+        if player_color is None or player_color != self.board.turn:
             return
 
-        if not piece.interact(msg["target"]):
+        piece = self.board.getPiece(msg["source"])
+        if piece is None or piece.color != player_color:
             return
 
-        chess_match.turn = (
-            ChessPieceColor.WHITE
-            if chess_match.turn == ChessPieceColor.BLACK
-            else ChessPieceColor.BLACK
+        move_id = uuid.uuid4().hex
+        move = self.room.interact(
+            msg["source"],
+            msg["target"],
+            move_id,
+            PIECE_CODES.get(msg.get("promotion"), EMPTY),
         )
-        chess_match.save()
-
-        async_to_sync(self.channel_layer.group_send)(
-            self.layer_name,
-            {
-                "type": "interaction",
-                "data": {
-                    "color": player_color,
-                    "source": msg["source"],
-                    "target": msg["target"],
-                },
-            },
+        if move is None:
+            return
+
+        await self.room.announce(
+            move_id,
+            move,
+            {"color": player_color, "source": msg["source"], "target": msg["target"]},
         )
 
-    def receive(self, text_data):
-        msg = json.loads(text_data)
+        self.start_engine()
 
-        if msg["type"] == "interaction":
-            self.receive_interaction_message(msg["data"])
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data is not None:
+            try:
+                msg = decode_message(bytes_data)
+            except ValueError:
+                return
+        else:
+            msg = json.loads(text_data)
 
-    def interaction(self, msg):
-        self.send(json.dumps({"type": msg["type"], "data": msg["data"]}))
+        if msg["type"] == "interaction":
+            await self.receive_interaction_message(msg["data"])
@@ -0,0 +1,360 @@
+import time
+from typing import Final, List, NamedTuple, Union
+
+from chess.game_logic import (
+    BISHOP,
+    BLACK,
+    EMPTY,
+    KING,
+    KNIGHT,
+    PAWN,
+    QUEEN,
+    ROOK,
+    TYPE_MASK,
+    Board,
+    Move,
+)
+from chess.models import ChessPieceColor
+from chess.tablebase import LOSS, WIN, Probe, Tablebases, tablebases
+from chess.transposition import EXACT, LOWER_BOUND, UPPER_BOUND, TranspositionTable
+
+# Iterative deepening alpha-beta search (negamax) with a quiescence search of
+# captures and promotions at the leaves. Scores are in centipawns from the view of
+# the side to move.
+
+MATE: Final = 100000
+# scores beyond this are mates, their distance to the root is adjusted in the table
+MATE_BOUND: Final = MATE - 1000
+INFINITY: Final = MATE + 1
+
+# number of nodes between two looks at the clock
+CLOCK_INTERVAL: Final = 1024
+
+VALUES: Final = (0, 100, 320, 330, 500, 900, 20000, 0)
+
+# piece-square tables from white's view, indexed like Board.squares (0 is a8)
+# fmt: off
+PAWN_TABLE: Final = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+KNIGHT_TABLE: Final = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+BISHOP_TABLE: Final = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+ROOK_TABLE: Final = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+)
+QUEEN_TABLE: Final = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+KING_TABLE: Final = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+)
+# fmt: on
+
+TABLES: Final = {
+    PAWN: PAWN_TABLE,
+    KNIGHT: KNIGHT_TABLE,
+    BISHOP: BISHOP_TABLE,
+    ROOK: ROOK_TABLE,
+    QUEEN: QUEEN_TABLE,
+    KING: KING_TABLE,
+}
+
+
+def piece_square_scores(code: int) -> tuple:
+    # value of the piece code on every field, positive for white and negative for black
+    piece_type = code & TYPE_MASK
+    if code == EMPTY or piece_type not in TABLES:
+        return (0,) * 64
+
+    table = TABLES[piece_type]
+    if code & BLACK:  # mirrored ranks
+        return tuple(-(VALUES[piece_type] + table[pos ^ 56]) for pos in range(64))
+    return tuple(VALUES[piece_type] + table[pos] for pos in range(64))
+
+
+# PIECE_SQUARE[code][pos]
+PIECE_SQUARE: Final = tuple(piece_square_scores(code) for code in range(16))
+
+
+def evaluate(board: Board) -> int:
+    score = 0
+    for pos, code in enumerate(board.squares):
+        if code:
+            score += PIECE_SQUARE[code][pos]
+
+    return -score if board.turn == ChessPieceColor.BLACK else score
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+class SearchResult(NamedTuple):
+    move: Union[Move, None]
+    score: int
+    depth: int  # of the last completed iteration
+    nodes: int
+
+
+class Search:
+    # One search on a board. The board is searched in place and restored afterwards,
+    # also when the time runs out.
+
+    def __init__(
+        self,
+        board: Board,
+        table: Union[TranspositionTable, None] = None,
+        endgames: Union[Tablebases, None] = None,
+    ):
+        self.board = board
+        self.table = table if table is not None else TranspositionTable()
+        # positions covered by the tablebases are scored exactly instead of searched
+        self.endgames = endgames
+        self.nodes = 0
+        self.deadline: Union[float, None] = None
+        self.path: List[int] = []  # hashes of the positions on the way to the node
+        self.root_best: Union[Move, None] = None
+
+    def run(
+        self, max_depth: int, time_limit: Union[float, None] = None
+    ) -> SearchResult:
+        # Searches one ply deeper per iteration until max_depth or the time limit is
+        # reached and returns the result of the deepest completed iteration. The
+        # first iteration always completes, so there is a move whenever one exists.
+        board = self.board
+        history_size = len(board.history)
+        result = SearchResult(None, 0, 0, 0)
+        self.table.new_search()
+        start = time.monotonic()
+
+        for depth in range(1, max(max_depth, 1) + 1):
+            self.root_best = None
+            try:
+                score = self.negamax(depth, -INFINITY, INFINITY, 0)
+            except SearchTimeout:
+                while len(board.history) > history_size:
+                    board.unmakeMove()
+                self.path.clear()
+                break
+
+            result = SearchResult(self.root_best, score, depth, self.nodes)
+            if self.root_best is None or abs(score) >= MATE_BOUND:
+                break  # no legal move or a forced mate has been found
+            if time_limit is not None:
+                self.deadline = start + time_limit
+                if time.monotonic() >= self.deadline:
+                    break
+
+        return result._replace(nodes=self.nodes)
+
+    def tick(self):
+        self.nodes += 1
+        if (
+            self.deadline is not None
+            and self.nodes % CLOCK_INTERVAL == 0
+            and time.monotonic() >= self.deadline
+        ):
+            raise SearchTimeout()
+
+    def negamax(self, depth: int, alpha: int, beta: int, ply: int) -> int:
+        self.tick()
+        board = self.board
+        key = board.hash
+
+        if ply and (board.halfmoveClock >= 100 or key in self.path):
+            return 0  # draw by the fifty move rule or repetition
+        if ply and self.endgames is not None:
+            probe = self.endgames.probe(board)
+            if probe is not None:
+                return score_from_probe(probe, ply)
+        if depth <= 0:
+            return self.quiesce(alpha, beta, ply)
+
+        original_alpha = alpha
+        table_move = None
+        entry = self.table.probe(key)
+        if entry is not None:
+            table_move = entry.move
+            if ply and entry.depth >= depth:
+                score = score_from_table(entry.score, ply)
+                if entry.flag == EXACT:
+                    return score
+                if entry.flag == LOWER_BOUND and score >= beta:
+                    return score
+                if entry.flag == UPPER_BOUND and score <= alpha:
+                    return score
+
+        mover = board.turn
+        best, best_move, legal = -INFINITY, None, 0
+        self.path.append(key)
+
+        for move in self.ordered(board.generatePseudoMoves(), table_move):
+            board.makeMove(move)
+            if board.isInCheck(mover):
+                board.unmakeMove()
+                continue
+
+            legal += 1
+            score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            board.unmakeMove()
+
+            if score > best:
+                best, best_move = score, move
+                if ply == 0:
+                    self.root_best = move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                break
+
+        self.path.pop()
+
+        if legal == 0:  # checkmate or stalemate
+            return -MATE + ply if board.isInCheck(mover) else 0
+
+        if best <= original_alpha:
+            flag = UPPER_BOUND
+        elif best >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.table.store(key, depth, score_to_table(best, ply), flag, best_move)
+        return best
+
+    def quiesce(self, alpha: int, beta: int, ply: int) -> int:
+        # only captures and promotions, until the position is quiet
+        self.tick()
+        board = self.board
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        squares = board.squares
+        epSquare = board.epSquare
+        mover = board.turn
+        tactical = [
+            move
+            for move in board.generatePseudoMoves()
+            if squares[move.target] != EMPTY
+            or move.promotion
+            or (move.target == epSquare and squares[move.source] & TYPE_MASK == PAWN)
+        ]
+
+        for move in self.ordered(tactical, None):
+            board.makeMove(move)
+            if board.isInCheck(mover):
+                board.unmakeMove()
+                continue
+
+            score = -self.quiesce(-beta, -alpha, ply + 1)
+            board.unmakeMove()
+
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+
+        return alpha
+
+    def ordered(self, moves: List[Move], table_move) -> List[Move]:
+        # the best move known from the table first, then captures of the most
+        # valuable victim by the least valuable attacker, then promotions
+        squares = self.board.squares
+
+        def priority(move: Move) -> int:
+            if move == table_move:
+                return 1 << 20
+            victim = squares[move.target] & TYPE_MASK
+            score = VALUES[move.promotion]
+            if victim:
+                score += 10 * VALUES[victim] - VALUES[squares[move.source] & TYPE_MASK]
+            return score
+
+        return sorted(moves, key=priority, reverse=True)
+
+
+def score_to_table(score: int, ply: int) -> int:
+    # mate scores are stored relative to the node instead of the root
+    if score >= MATE_BOUND:
+        return score + ply
+    if score <= -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_table(score: int, ply: int) -> int:
+    if score >= MATE_BOUND:
+        return score - ply
+    if score <= -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def score_from_probe(probe: Probe, ply: int) -> int:
+    if probe.wdl == WIN:
+        return MATE - ply - probe.plies
+    if probe.wdl == LOSS:
+        return -MATE + ply + probe.plies
+    return 0
+
+
+def search(
+    board: Board,
+    max_depth: int,
+    time_limit: Union[float, None] = None,
+    endgames: Union[Tablebases, None] = None,
+) -> SearchResult:
+    return Search(board, endgames=endgames).run(max_depth, time_limit)
+
+
+def search_packed(packed: bytes, max_depth: int, time_limit: float) -> SearchResult:
+    # entry point for worker processes, positions travel as Board.pack bytes
+    return search(Board.unpack(packed), max_depth, time_limit, tablebases())
@@ -0,0 +1,164 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from typing import Dict, Union
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from chess.protocol import encode_interaction
+
+
+class Frame:
+    # An interaction as sent to clients, every encoding is built at most once and
+    # then shared by all sockets of the room.
+
+    __slots__ = ("seq", "data", "_text", "_binary")
+
+    def __init__(self, seq: int, data: dict):
+        self.seq = seq
+        self.data = data
+        self._text: Union[str, None] = None
+        self._binary: Union[bytes, None] = None
+
+    @property
+    def text(self) -> str:
+        if self._text is None:
+            self._text = json.dumps(
+                {"type": "interaction", "data": self.data, "seq": self.seq}
+            )
+        return self._text
+
+    @property
+    def binary(self) -> bytes:
+        if self._binary is None:
+            self._binary = encode_interaction(self.data, self.seq)
+        return self._binary
+
+
+class Delivery:
+    # The frames waiting for one socket. A socket that falls more than backlog frames
+    # behind gets the current state instead of every move it missed.
+
+    def __init__(self, consumer, backlog: int):
+        self.consumer = consumer
+        self.backlog = backlog
+        self.pending: "deque[Frame]" = deque()
+        self.resync = True
+        self.ready = asyncio.Event()
+        self.ready.set()
+        self.task = asyncio.ensure_future(self.run())
+
+    def push(self, frame: Frame):
+        if self.resync:
+            return  # the state that is about to be sent covers the move
+
+        if len(self.pending) >= self.backlog:
+            self.pending.clear()
+            self.resync = True
+        else:
+            self.pending.append(frame)
+        self.ready.set()
+
+    async def run(self):
+        while True:
+            await self.ready.wait()
+            self.ready.clear()
+
+            if self.resync:
+                # the state is taken when sending starts, moves pushed while it is
+                # being sent are queued and skipped if the state already has them
+                self.resync = False
+                seq = await self.consumer.send_state()
+                while self.pending and self.pending[0].seq <= seq:
+                    self.pending.popleft()
+
+            while self.pending:
+                await self.consumer.send_frame(self.pending.popleft())
+
+
+def group_name(match_id: int) -> str:
+    return f"chess_{match_id}"
+
+
+def seats_message(chess_match) -> dict:
+    # tells the rooms of all processes that a seat of the match has been claimed
+    return {"type": "seats", "white": chess_match.white, "black": chess_match.black}
+
+
+class Fanout:
+    # Delivers the moves of a room to the sockets connected to it in this process.
+    # The process subscribes to the room's channel group once, with a relay channel,
+    # instead of once per socket, and every move is encoded once for all sockets.
+    # The relay runs from the first subscriber until the room is evicted, so rooms
+    # kept in memory without connections still follow moves and seat changes.
+
+    def __init__(self, room):
+        self.room = room
+        self.group = group_name(room.match_id)
+        self.backlog = getattr(settings, "CHESS_FANOUT_BACKLOG", 32)
+        self.deliveries: Dict[str, Delivery] = {}
+        self.channel_layer = None
+        self.relay: Union[asyncio.Task, None] = None
+        self.loop: Union[asyncio.AbstractEventLoop, None] = None
+
+    def subscribe(self, consumer, resync: bool = True) -> Delivery:
+        # Starts delivering to the consumer. Unless resync is set, the caller queues
+        # the frames the consumer has missed before anything else is pushed.
+        delivery = Delivery(consumer, self.backlog)
+        delivery.resync = resync
+        self.deliveries[consumer.channel_name] = delivery
+
+        if self.relay is None:
+            self.channel_layer = get_channel_layer()
+            self.loop = asyncio.get_running_loop()
+            self.relay = self.loop.create_task(self.run_relay())
+
+        return delivery
+
+    def unsubscribe(self, consumer):
+        delivery = self.deliveries.pop(consumer.channel_name, None)
+        if delivery is not None:
+            delivery.task.cancel()
+
+    def close(self):
+        # called from any thread when the room is evicted
+        if self.relay is not None:
+            relay, self.relay = self.relay, None
+            self.loop.call_soon_threadsafe(relay.cancel)
+
+    def publish(self, seq: int, data: dict):
+        frame = Frame(seq, data)
+        for delivery in self.deliveries.values():
+            delivery.push(frame)
+
+    async def group_send(self, message: dict):
+        # broadcasts to the relays of all processes, including this one
+        await self.channel_layer.group_send(self.group, message)
+
+    async def run_relay(self):
+        channel = await self.channel_layer.new_channel()
+        await self.channel_layer.group_add(self.group, channel)
+
+        try:
+            while True:
+                message = await self.channel_layer.receive(channel)
+                try:
+                    self.relayed(message)
+                except Exception:
+                    logging.exception("Relaying a chess message failed.")
+        finally:
+            await self.channel_layer.group_discard(self.group, channel)
+
+    def relayed(self, message: dict):
+        if message["type"] == "interaction":
+            # moves of this process have been published when they were made
+            if self.room.apply(message["id"], message["move"], message["seq"]):
+                self.room.remember(message["seq"], message["data"])
+                self.publish(message["seq"], message["data"])
+
+        elif message["type"] == "seats":
+            self.room.set_seats(message["white"], message["black"])
+            for delivery in self.deliveries.values():
+                delivery.consumer.seats_changed()
@@ -1,6 +1,20 @@
-from typing import List, Union, Final
+import struct
+from typing import Iterator, List, NamedTuple, Tuple, Union, Final
 from abc import ABC
-from .models import ChessMatchModel, ChessPieceModel, ChessPieceType, ChessPieceColor
+from .models import ChessPieceType, ChessPieceColor
+from .attack_tables import (
+    RAYS,
+    ROOK_DIRECTIONS,
+    BISHOP_DIRECTIONS,
+    BISHOP_RAYS,
+    ROOK_RAYS,
+    QUEEN_RAYS,
+    KNIGHT_TARGETS,
+    KING_TARGETS,
+    WHITE_PAWN_ATTACKS,
+    BLACK_PAWN_ATTACKS,
+)
+from .zobrist import PIECE_KEYS, CASTLING_KEYS, EP_KEYS, SIDE_KEY
 
 N: Final = -8
 E: Final = 1
@@ -36,88 +50,713 @@ class Piece:
     pass
 
 
+# piece codes of the compact board; the color bit is set for black pieces
+EMPTY: Final = 0
+PAWN: Final = 1
+KNIGHT: Final = 2
+BISHOP: Final = 3
+ROOK: Final = 4
+QUEEN: Final = 5
+KING: Final = 6
+BLACK: Final = 8
+TYPE_MASK: Final = 7
+
+PIECE_CODES: Final = {
+    ChessPieceType.PAWN: PAWN,
+    ChessPieceType.KNIGHT: KNIGHT,
+    ChessPieceType.BISHOP: BISHOP,
+    ChessPieceType.ROOK: ROOK,
+    ChessPieceType.QUEEN: QUEEN,
+    ChessPieceType.KING: KING,
+}
+PIECE_TYPES: Final = {code: pieceType for pieceType, code in PIECE_CODES.items()}
+
+# castling rights bit flags
+WHITE_KINGSIDE: Final = 1
+WHITE_QUEENSIDE: Final = 2
+BLACK_KINGSIDE: Final = 4
+BLACK_QUEENSIDE: Final = 8
+ALL_CASTLING: Final = 15
+
+# the castling right that belongs to the king and rook on their home squares
+CASTLING_RIGHTS: Final = {
+    0: BLACK_QUEENSIDE,
+    4: BLACK_KINGSIDE | BLACK_QUEENSIDE,
+    7: BLACK_KINGSIDE,
+    56: WHITE_QUEENSIDE,
+    60: WHITE_KINGSIDE | WHITE_QUEENSIDE,
+    63: WHITE_KINGSIDE,
+}
+
+# rights that survive a piece moving from or to a square
+CASTLING_MASK: Final = bytes(
+    ALL_CASTLING & ~CASTLING_RIGHTS.get(pos, 0) for pos in range(64)
+)
+
+
+def encodePiece(pieceType, color) -> int:
+    return PIECE_CODES[pieceType] | (BLACK if color == ChessPieceColor.BLACK else 0)
+
+
+def pieceTypeOf(code: int):
+    return PIECE_TYPES[code & TYPE_MASK]
+
+
+def colorOf(code: int):
+    return ChessPieceColor.BLACK if code & BLACK else ChessPieceColor.WHITE
+
+
+def colorIndex(color) -> int:
+    return 1 if color == ChessPieceColor.BLACK else 0
+
+
+def opponentOf(color):
+    return (
+        ChessPieceColor.WHITE
+        if color == ChessPieceColor.BLACK
+        else ChessPieceColor.BLACK
+    )
+
+
+PROMOTIONS: Final = (QUEEN, ROOK, BISHOP, KNIGHT)
+
+FEN_PIECES: Final = "PNBRQK"
+START_FEN: Final = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+FEN_CASTLING: Final = (
+    ("K", WHITE_KINGSIDE),
+    ("Q", WHITE_QUEENSIDE),
+    ("k", BLACK_KINGSIDE),
+    ("q", BLACK_QUEENSIDE),
+)
+
+# king move, rook source and rook target of each castling
+CASTLINGS: Final = {
+    WHITE_KINGSIDE: (60, 62, 63, 61),
+    WHITE_QUEENSIDE: (60, 58, 56, 59),
+    BLACK_KINGSIDE: (4, 6, 7, 5),
+    BLACK_QUEENSIDE: (4, 2, 0, 3),
+}
+
+
+# Packed position: 32 bytes with the piece code of two fields each, the first field in the
+# high nibble, followed by castling rights and side to move (bit 4 set for black), the en
+# passant field (255 for none), the halfmove clock and the fullmove number.
+PACKED_TAIL: Final = struct.Struct(">BBHH")
+PACKED_SIZE: Final = 32 + PACKED_TAIL.size
+NO_EP: Final = 255
+
+
+def squareName(pos: int) -> str:
+    return "abcdefgh"[pos % 8] + str(8 - pos // 8)
+
+
+def parseSquare(name: str) -> int:
+    return (8 - int(name[1])) * 8 + "abcdefgh".index(name[0])
+
+
+class Move(NamedTuple):
+    source: int
+    target: int
+    promotion: int = EMPTY  # piece type code of the promoted piece
+
+    def uci(self) -> str:
+        promotion = FEN_PIECES[self.promotion - 1].lower() if self.promotion else ""
+        return squareName(self.source) + squareName(self.target) + promotion
+
+    @staticmethod
+    def fromUci(uci: str) -> "Move":
+        promotion = FEN_PIECES.index(uci[4].upper()) + 1 if len(uci) > 4 else EMPTY
+        return Move(parseSquare(uci[0:2]), parseSquare(uci[2:4]), promotion)
+
+
 class Board:
-    def __init__(self, match: ChessMatchModel):
-        self.match: ChessMatchModel = match
-        self.fields = [None for i in range(64)]
-        for piece in match.pieces.all():
-            self.fields[piece.pos] = PieceFactory.create(
-                piece.type, piece.color, piece.pos, self
+    def __init__(self):
+        self.squares: bytearray = bytearray(64)
+        # Zobrist hash of the position, kept current by setField and the setters below
+        self.hash: int = 0
+        self._turn = ChessPieceColor.WHITE
+        self._castling: int = 0
+        self._epSquare: Union[int, None] = None
+        self.halfmoveClock: int = 0
+        self.fullmoveNumber: int = 1
+        # undo information of the moves applied with makeMove
+        self.history: List[tuple] = list()
+        # number of pieces of each color attacking a field, indexed by colorIndex
+        self.attacks = (bytearray(64), bytearray(64))
+
+    @property
+    def turn(self):
+        return self._turn
+
+    @turn.setter
+    def turn(self, color):
+        if color != self._turn:
+            self.hash ^= SIDE_KEY
+        self._turn = color
+
+    @property
+    def castling(self) -> int:
+        return self._castling
+
+    @castling.setter
+    def castling(self, rights: int):
+        self.hash ^= CASTLING_KEYS[self._castling] ^ CASTLING_KEYS[rights]
+        self._castling = rights
+
+    @property
+    def epSquare(self) -> Union[int, None]:
+        return self._epSquare
+
+    @epSquare.setter
+    def epSquare(self, pos: Union[int, None]):
+        if self._epSquare is not None:
+            self.hash ^= EP_KEYS[self._epSquare % 8]
+        if pos is not None:
+            self.hash ^= EP_KEYS[pos % 8]
+        self._epSquare = pos
+
+    @property
+    def ply(self) -> int:
+        # number of half moves played since the start of the game
+        return 2 * (self.fullmoveNumber - 1) + (self._turn == ChessPieceColor.BLACK)
+
+    def rebuildHash(self):
+        key = CASTLING_KEYS[self._castling]
+        for pos, code in enumerate(self.squares):
+            key ^= PIECE_KEYS[code][pos]
+        if self._epSquare is not None:
+            key ^= EP_KEYS[self._epSquare % 8]
+        if self._turn == ChessPieceColor.BLACK:
+            key ^= SIDE_KEY
+        self.hash = key
+
+    @staticmethod
+    def fromFen(fen: str) -> "Board":
+        # Raises ValueError for malformed FENs and for positions that cannot occur in
+        # a game, which move generation relies on not to see.
+        fields = fen.split()
+        if len(fields) < 2 or fields[1] not in ("w", "b"):
+            raise ValueError(f"Invalid FEN: {fen}")
+
+        board = Board()
+        rows = fields[0].split("/")
+        if len(rows) != 8:
+            raise ValueError(f"Invalid FEN, a board has 8 rows: {fen}")
+        for row, text in enumerate(rows):
+            pos = row * 8
+            for c in text:
+                if c in "12345678":
+                    pos += int(c)
+                    continue
+                if c.upper() not in FEN_PIECES or pos >= row * 8 + 8:
+                    raise ValueError(f"Invalid FEN row {text}: {fen}")
+                board.squares[pos] = (FEN_PIECES.index(c.upper()) + 1) | (
+                    BLACK if c.islower() else 0
+                )
+                pos += 1
+            if pos != row * 8 + 8:
+                raise ValueError(f"Invalid FEN row {text}: {fen}")
+
+        board.turn = (
+            ChessPieceColor.BLACK if fields[1] == "b" else ChessPieceColor.WHITE
+        )
+        castling = fields[2] if len(fields) > 2 else "-"
+        board.castling = sum(right for c, right in FEN_CASTLING if c in castling)
+        ep = fields[3] if len(fields) > 3 else "-"
+        try:
+            board.epSquare = None if ep == "-" else parseSquare(ep)
+            board.halfmoveClock = int(fields[4]) if len(fields) > 4 else 0
+            board.fullmoveNumber = int(fields[5]) if len(fields) > 5 else 1
+        except (ValueError, IndexError):
+            raise ValueError(f"Invalid FEN: {fen}")
+        if not (0 <= board.halfmoveClock < 65536 and 0 < board.fullmoveNumber < 65536):
+            raise ValueError(f"Invalid move counters: {fen}")
+
+        board.validate()
+        if board.epSquare is not None:
+            # kept only if a pawn can take there, as makeMove does, so that equal
+            # positions get equal hashes
+            ep = board.epSquare
+            if board.turn == ChessPieceColor.BLACK:
+                board.epSquare = board.capturableEpSquare(ep + 8, ep - 8)
+            else:
+                board.epSquare = board.capturableEpSquare(ep - 8, ep + 8)
+        board.rebuildAttacks()
+        board.rebuildHash()
+        if board.isInCheck(opponentOf(board.turn)):
+            raise ValueError(f"The side not to move is in check: {fen}")
+        return board
+
+    def validate(self):
+        # the conditions of a position from a game that are not about attacks
+        squares = self.squares
+        for color in (0, BLACK):
+            if squares.count(KING | color) != 1:
+                raise ValueError("Each side needs exactly one king.")
+        if any(squares[pos] & TYPE_MASK == PAWN for pos in (*range(8), *range(56, 64))):
+            raise ValueError("Pawns cannot stand on the first or last row.")
+        if self.castling & ~self.inferCastlingRights():
+            raise ValueError("Castling rights need the king and rook on their fields.")
+
+        ep = self.epSquare
+        if ep is not None:
+            # the field a pawn of the side not to move just skipped
+            black = self.turn == ChessPieceColor.BLACK
+            pawn = ep - 8 if black else ep + 8
+            if (
+                not inRow(ep, 6 if black else 3)
+                or squares[pawn] != PAWN | (0 if black else BLACK)
+                or squares[ep] != EMPTY
+            ):
+                raise ValueError(f"Invalid en passant field {squareName(ep)}.")
+
+    def toFen(self) -> str:
+        rows = list()
+
+        for row in range(8):
+            fen, empty = "", 0
+            for code in self.squares[row * 8 : row * 8 + 8]:
+                if code == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    fen, empty = fen + str(empty), 0
+                c = FEN_PIECES[(code & TYPE_MASK) - 1]
+                fen += c.lower() if code & BLACK else c
+            rows.append(fen + (str(empty) if empty else ""))
+
+        castling = "".join(c for c, right in FEN_CASTLING if self.castling & right)
+        return " ".join(
+            (
+                "/".join(rows),
+                "b" if self.turn == ChessPieceColor.BLACK else "w",
+                castling or "-",
+                "-" if self.epSquare is None else squareName(self.epSquare),
+                str(self.halfmoveClock),
+                str(self.fullmoveNumber),
             )
+        )
+
+    def pack(self) -> bytes:
+        squares = self.squares
+        fields = bytes(squares[i] << 4 | squares[i + 1] for i in range(0, 64, 2))
+        return fields + PACKED_TAIL.pack(
+            self.castling | (16 if self.turn == ChessPieceColor.BLACK else 0),
+            NO_EP if self.epSquare is None else self.epSquare,
+            self.halfmoveClock,
+            self.fullmoveNumber,
+        )
+
+    @staticmethod
+    def unpack(data: bytes) -> "Board":
+        if len(data) != PACKED_SIZE:
+            raise ValueError(f"Packed positions have {PACKED_SIZE} bytes.")
+
+        board = Board()
+        squares = board.squares
+        for i, byte in enumerate(data[:32]):
+            squares[2 * i] = byte >> 4
+            squares[2 * i + 1] = byte & 15
+
+        flags, ep, board.halfmoveClock, board.fullmoveNumber = PACKED_TAIL.unpack(
+            data[32:]
+        )
+        board.castling = flags & ALL_CASTLING
+        board.turn = ChessPieceColor.BLACK if flags & 16 else ChessPieceColor.WHITE
+        board.epSquare = None if ep == NO_EP else ep
+        board.rebuildAttacks()
+        board.rebuildHash()
+        return board
+
+    def inferCastlingRights(self) -> int:
+        # piece rows carry no move history, so a king and rook on their home squares
+        # are assumed to be unmoved
+        rights = 0
+        for king, rook, color, right in (
+            (60, 63, 0, WHITE_KINGSIDE),
+            (60, 56, 0, WHITE_QUEENSIDE),
+            (4, 7, BLACK, BLACK_KINGSIDE),
+            (4, 0, BLACK, BLACK_QUEENSIDE),
+        ):
+            if (
+                self.squares[king] == KING | color
+                and self.squares[rook] == ROOK | color
+            ):
+                rights |= right
+        return rights
+
+    def rebuildAttacks(self):
+        self.attacks = (bytearray(64), bytearray(64))
+        for pos, code in enumerate(self.squares):
+            if code != EMPTY:
+                self.updateAttacks(pos, 1)
+
+    def attackedFields(self, pos: int) -> Tuple[int, ...]:
+        code = self.squares[pos]
+        pieceType = code & TYPE_MASK
+
+        if pieceType == PAWN:
+            return BLACK_PAWN_ATTACKS[pos] if code & BLACK else WHITE_PAWN_ATTACKS[pos]
+        if pieceType == KNIGHT:
+            return KNIGHT_TARGETS[pos]
+        if pieceType == KING:
+            return KING_TARGETS[pos]
+
+        rays = (
+            ROOK_RAYS
+            if pieceType == ROOK
+            else BISHOP_RAYS if pieceType == BISHOP else QUEEN_RAYS
+        )
+        squares = self.squares
+        fields = list()
+        for ray in rays[pos]:
+            for x in ray:
+                fields.append(x)
+
+                if squares[x]:
+                    break
+
+        return tuple(fields)
+
+    def updateAttacks(self, pos: int, delta: int):
+        counts = self.attacks[self.squares[pos] >> 3]
+        for field in self.attackedFields(pos):
+            counts[field] += delta
+
+    def slidersReaching(self, pos: int) -> List[int]:
+        # sliding pieces whose attacks run through pos, so a change of its occupancy
+        # lengthens or shortens their rays
+        squares = self.squares
+        sliders = list()
+
+        for directions, sliderTypes in (
+            (ROOK_DIRECTIONS, (ROOK, QUEEN)),
+            (BISHOP_DIRECTIONS, (BISHOP, QUEEN)),
+        ):
+            for d in directions:
+                for x in RAYS[d][pos]:
+                    if squares[x]:
+                        if squares[x] & TYPE_MASK in sliderTypes:
+                            sliders.append(x)
+                        break
+
+        return sliders
+
+    def setField(self, pos: int, code: int):
+        # single entry point for changing a field, keeps the attack maps in step
+        squares = self.squares
+        previous = squares[pos]
+        if previous == code:
+            return
+
+        sliders = (
+            self.slidersReaching(pos) if (previous == EMPTY) != (code == EMPTY) else []
+        )
+        for x in sliders:
+            self.updateAttacks(x, -1)
+        if previous != EMPTY:
+            self.updateAttacks(pos, -1)
+
+        squares[pos] = code
+        self.hash ^= PIECE_KEYS[previous][pos] ^ PIECE_KEYS[code][pos]
+
+        if code != EMPTY:
+            self.updateAttacks(pos, 1)
+        for x in sliders:
+            self.updateAttacks(x, 1)
+
+    def isAttacked(self, pos: int, color) -> bool:
+        return self.attacks[colorIndex(color)][pos] > 0
 
     def getPiece(self, pos: int) -> Union[Piece, None]:
-        return self.fields[pos]
+        code = self.squares[pos]
+        if code == EMPTY:
+            return None
+
+        return PieceFactory.create(pieceTypeOf(code), colorOf(code), pos, self)
+
+    def pieces(self, color=None) -> Iterator[Piece]:
+        for pos, code in enumerate(self.squares):
+            if code != EMPTY and (color is None or colorOf(code) == color):
+                yield PieceFactory.create(pieceTypeOf(code), colorOf(code), pos, self)
+
+    def pieceList(self) -> List[dict]:
+        return [
+            {"pos": pos, "type": pieceTypeOf(code), "color": colorOf(code)}
+            for pos, code in enumerate(self.squares)
+            if code != EMPTY
+        ]
 
     def isOccupied(self, pos: int) -> bool:
-        return self.fields[pos] != None
+        return self.squares[pos] != EMPTY
 
     def getColor(self, pos: int):
         if not self.isOccupied(pos):
             raise Exception("Field is empty.")
 
-        return self.fields[pos].color
+        return colorOf(self.squares[pos])
 
-    def spawn(self, pieceType, color, pos: int) -> Piece:
-        self.fields[pos] = PieceFactory.create(self, pieceType, color, pos)
-        self.match.pieces.add(
-            ChessPieceModel(
-                chess_match=self.match, pos=pos, type=pieceType, color=color
-            )
+    def kingField(self, color) -> int:
+        return self.squares.find(
+            KING | (BLACK if color == ChessPieceColor.BLACK else 0)
         )
-        return self.fields[pos]
-
-    def swap(self, pos: int, otherPos: int):
 
-        x = self.fields[pos]
-        self.fields[pos] = self.fields[otherPos]
-        self.fields[otherPos] = x
-        self.fields[pos].pos = pos
-        self.fields[otherPos].pos = otherPos
+    def isInCheck(self, color=None) -> bool:
+        color = self.turn if color is None else color
+        king = self.kingField(color)
+        return king >= 0 and self.isAttacked(king, opponentOf(color))
+
+    def generatePseudoMoves(self) -> List[Move]:
+        # moves that follow the piece rules but may leave the own king in check
+        squares = self.squares
+        us = BLACK if self.turn == ChessPieceColor.BLACK else 0
+        moves = list()
+        append = moves.append
+
+        for pos, code in enumerate(squares):
+            if code == EMPTY or code & BLACK != us:
+                continue
+
+            pieceType = code & TYPE_MASK
+
+            if pieceType == PAWN:
+                self.generatePawnMoves(pos, us, moves)
+                continue
+
+            if pieceType == KNIGHT or pieceType == KING:
+                for x in (
+                    KNIGHT_TARGETS[pos] if pieceType == KNIGHT else KING_TARGETS[pos]
+                ):
+                    if squares[x] == EMPTY or squares[x] & BLACK != us:
+                        append(Move(pos, x))
+                continue
+
+            rays = (
+                ROOK_RAYS
+                if pieceType == ROOK
+                else BISHOP_RAYS if pieceType == BISHOP else QUEEN_RAYS
+            )
+            for ray in rays[pos]:
+                for x in ray:
+                    if squares[x] == EMPTY:
+                        append(Move(pos, x))
+                        continue
+                    if squares[x] & BLACK != us:
+                        append(Move(pos, x))
+                    break
+
+        self.generateCastlingMoves(us, moves)
+        return moves
+
+    def generatePawnMoves(self, pos: int, us: int, moves: List[Move]):
+        squares = self.squares
+        forward, startRow, promotionRow = (S, 2, 8) if us else (N, 7, 1)
+        targets = list()
+
+        x = pos + forward
+        if squares[x] == EMPTY:
+            targets.append(x)
+            if inRow(pos, startRow) and squares[x + forward] == EMPTY:
+                targets.append(x + forward)
+
+        for x in BLACK_PAWN_ATTACKS[pos] if us else WHITE_PAWN_ATTACKS[pos]:
+            if (squares[x] != EMPTY and squares[x] & BLACK != us) or x == self.epSquare:
+                targets.append(x)
+
+        for x in targets:
+            if inRow(x, promotionRow):
+                moves.extend(Move(pos, x, promotion) for promotion in PROMOTIONS)
+            else:
+                moves.append(Move(pos, x))
+
+    def generateCastlingMoves(self, us: int, moves: List[Move]):
+        them = ChessPieceColor.WHITE if us else ChessPieceColor.BLACK
+        rights = self.castling & (
+            (BLACK_KINGSIDE | BLACK_QUEENSIDE)
+            if us
+            else (WHITE_KINGSIDE | WHITE_QUEENSIDE)
+        )
 
-        # remember that the pieces have been swapped in this instance
-        # if otherPos is occupied then the there is a piece at pos in the database that we need to update
-        if self.isOccupied(otherPos):
-            p = self.match.pieces.get(pos=pos)
-            p.pos = otherPos
-            p.save()
+        for right, (king, kingTarget, rook, rookTarget) in CASTLINGS.items():
+            if not rights & right:
+                continue
+
+            inc = 1 if rook > king else -1
+            if any(self.squares[i] != EMPTY for i in range(king + inc, rook, inc)):
+                continue
+
+            # the king may not castle out of, through or into check
+            if any(self.isAttacked(i, them) for i in (king, king + inc, kingTarget)):
+                continue
+
+            moves.append(Move(king, kingTarget))
+
+    def generateLegalMoves(self) -> List[Move]:
+        return [move for move in self.generatePseudoMoves() if self.isLegal(move)]
+
+    def isLegal(self, move: Move) -> bool:
+        mover = colorOf(self.squares[move.source])
+        self.makeMove(move)
+        legal = not self.isInCheck(mover)
+        self.unmakeMove()
+        return legal
+
+    def makeMove(self, move: Move):
+        # applies a move in memory only, it can be reverted with unmakeMove
+        source, target, promotion = move
+        squares = self.squares
+        code = squares[source]
+        pieceType = code & TYPE_MASK
+        capturedPos = target
+
+        if pieceType == PAWN and target == self.epSquare:
+            capturedPos = target + (N if code & BLACK else S)
+
+        captured = squares[capturedPos]
+        self.history.append(
+            (
+                move,
+                captured,
+                capturedPos,
+                self.castling,
+                self.epSquare,
+                self.halfmoveClock,
+            )
+        )
 
-        if self.isOccupied(pos):
-            p = self.match.pieces.get(pos=otherPos)
-            p.pos = pos
-            p.save()
+        if capturedPos != target:
+            self.setField(capturedPos, EMPTY)
+        self.setField(target, promotion | (code & BLACK) if promotion else code)
+        self.setField(source, EMPTY)
+
+        if pieceType == KING and abs(target - source) == 2:
+            rook = source + 3 if target > source else source - 4
+            self.setField((source + target) // 2, squares[rook])
+            self.setField(rook, EMPTY)
+
+        self.castling &= CASTLING_MASK[source] & CASTLING_MASK[target]
+        self.epSquare = (
+            self.capturableEpSquare(source, target)
+            if pieceType == PAWN and abs(target - source) == 16
+            else None
+        )
+        self.halfmoveClock = (
+            0 if pieceType == PAWN or captured != EMPTY else self.halfmoveClock + 1
+        )
+        if code & BLACK:
+            self.fullmoveNumber += 1
+        self.turn = opponentOf(self.turn)
+
+    def capturableEpSquare(self, source: int, target: int) -> Union[int, None]:
+        # only record the en passant field if an enemy pawn can take there, so that
+        # otherwise identical positions share their hash
+        ep = (source + target) // 2
+        if self.squares[target] & BLACK:
+            enemyPawn, attackers = PAWN, BLACK_PAWN_ATTACKS[ep]
+        else:
+            enemyPawn, attackers = PAWN | BLACK, WHITE_PAWN_ATTACKS[ep]
 
-    def replace(self, pos: int, replacedPos: int):
+        if any(self.squares[x] == enemyPawn for x in attackers):
+            return ep
+        return None
 
-        self.fields[replacedPos] = self.fields[pos]
-        self.fields[pos] = None
+    def unmakeMove(self) -> Move:
+        move, captured, capturedPos, castling, epSquare, halfmoveClock = (
+            self.history.pop()
+        )
+        source, target, promotion = move
+        squares = self.squares
+        code = squares[target]
+
+        if promotion:
+            code = PAWN | (code & BLACK)
+
+        if code & TYPE_MASK == KING and abs(target - source) == 2:
+            rook = source + 3 if target > source else source - 4
+            self.setField(rook, squares[(source + target) // 2])
+            self.setField((source + target) // 2, EMPTY)
+
+        self.setField(source, code)
+        self.setField(target, captured if capturedPos == target else EMPTY)
+        if capturedPos != target:
+            self.setField(capturedPos, captured)
+
+        self.castling = castling
+        self.epSquare = epSquare
+        self.halfmoveClock = halfmoveClock
+        if code & BLACK:
+            self.fullmoveNumber -= 1
+        self.turn = opponentOf(self.turn)
+        return move
+
+    def lastMove(self) -> Union[Move, None]:
+        return self.history[-1][0] if self.history else None
+
+    def perft(self, depth: int) -> int:
+        # number of leaf nodes of the legal move tree, the standard move generator check
+        if depth == 0:
+            return 1
+
+        moves = self.generateLegalMoves()
+        if depth == 1:
+            return len(moves)
+
+        nodes = 0
+        for move in moves:
+            self.makeMove(move)
+            nodes += self.perft(depth - 1)
+            self.unmakeMove()
+
+        return nodes
 
-        if self.isOccupied(replacedPos):
-            self.fields[replacedPos].pos = replacedPos
+    def spawn(self, pieceType, color, pos: int) -> Piece:
+        self.setField(pos, encodePiece(pieceType, color))
+        return self.getPiece(pos)
 
-        # if we moved a piece to replacedPos
-        try:
-            p = self.match.pieces.get(pos=replacedPos)
-            p.delete()
-        except ChessPieceModel.DoesNotExist:
-            pass
+    def swap(self, pos: int, otherPos: int):
+        code, otherCode = self.squares[pos], self.squares[otherPos]
+        self.setField(pos, EMPTY)
+        self.setField(otherPos, code)
+        self.setField(pos, otherCode)
+        self.castling &= CASTLING_MASK[pos] & CASTLING_MASK[otherPos]
 
-        if self.isOccupied(replacedPos):
-            p = self.match.pieces.get(pos=pos)
-            p.pos = replacedPos
-            p.save()
+    def replace(self, pos: int, replacedPos: int):
+        self.setField(replacedPos, self.squares[pos])
+        self.setField(pos, EMPTY)
+        self.castling &= CASTLING_MASK[pos] & CASTLING_MASK[replacedPos]
 
 
 class Piece(ABC):
+    # pieces are short-lived views onto a square of the board's compact representation
+    __slots__ = ("pieceType", "color", "pos", "board")
+
     def __init__(self, pieceType, color, pos: int, board: Board):
         self.pieceType = pieceType
         self.color = color
         self.pos: int = pos
         self.board: Board = board
-        self.hasMoved: bool = False
+
+    @property
+    def hasMoved(self) -> bool:
+        return False
 
     def interactable(self) -> List[int]:
         pass
 
+    def slide(self, rays) -> List[int]:
+        # walk each ray up to and including the first occupied field
+        squares = self.board.squares
+        fields = list()
+
+        for ray in rays:
+            for x in ray:
+                fields.append(x)
+
+                if squares[x]:
+                    break
+
+        return fields
+
     def movableFields(self) -> List[int]:
         return [
             field for field in self.interactable() if not self.board.isOccupied(field)
@@ -130,13 +769,18 @@ class Piece(ABC):
             if self.board.isOccupied(field) and self.board.getColor(field) != self.color
         ]
 
-    def interact(self, pos: int) -> bool:
-        if pos in self.movableFields() or pos in self.attackableFields():
-            self.board.replace(self.pos, pos)
-            self.hasMoved = True
-            return True
+    def moveTo(self, pos: int) -> Move:
+        return Move(self.pos, pos)
 
-        return False
+    def interact(self, pos: int, promotion: int = EMPTY) -> bool:
+        move = self.moveTo(pos)
+        if promotion and move.promotion:  # underpromotion instead of the default queen
+            move = move._replace(promotion=promotion)
+        if move not in self.board.generateLegalMoves():
+            return False
+
+        self.board.makeMove(move)
+        return True
 
 
 class Bishop(Piece):
@@ -144,106 +788,31 @@ class Bishop(Piece):
         super().__init__(ChessPieceType.BISHOP, color, pos, board)
 
     def interactable(self) -> List[int]:
-        fields = list()
-
-        x = self.pos
-
-        while not atLeftBorder(x) and not atTopBorder(x):  # NW
-            x += NW
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atRightBorder(x) and not atTopBorder(x):  # NE
-            x += NE
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atBottomBorder(x) and not atLeftBorder(x):  # SW
-            x += SW
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atBottomBorder(x) and not atRightBorder(x):  # SE
-            x += SE
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        return fields
+        return self.slide(BISHOP_RAYS[self.pos])
 
 
 class Rook(Piece):
     def __init__(self, color, pos: int, board: Board):
         super().__init__(ChessPieceType.ROOK, color, pos, board)
 
-    def interactable(self) -> List[int]:
-        fields = list()
-
-        x = self.pos
-
-        while not atBottomBorder(x):
-            x += S
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atTopBorder(x):
-            x += N
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atLeftBorder(x):
-            x += W
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atRightBorder(x):
-            x += E
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        return fields
-
-    def interact(self, pos: int) -> bool:
-        if self.movableFields().includes(pos):
-            self.board.swap(self.pos, pos)
-            return True
+    @property
+    def hasMoved(self) -> bool:
+        return not self.board.castling & CASTLING_RIGHTS.get(self.pos, 0)
 
-        return False
+    def interactable(self) -> List[int]:
+        return self.slide(ROOK_RAYS[self.pos])
 
 
 class Pawn(Piece):
     def __init__(self, color, pos: int, board: Board):
         super().__init__(ChessPieceType.PAWN, color, pos, board)
 
+    @property
+    def hasMoved(self) -> bool:
+        return not inRow(self.pos, 7 if self.color == ChessPieceColor.WHITE else 2)
+
     def interactable(self) -> List[int]:
-        return self.movableFields().concat(self.attackableFields())
+        return self.movableFields() + self.attackableFields()
 
     def movableFields(self) -> List[int]:
         fields = list()
@@ -269,21 +838,11 @@ class Pawn(Piece):
         return [field for field in fields if not self.board.isOccupied(field)]
 
     def attackableFields(self) -> List[int]:
-        fields = list()
-
-        if self.color == ChessPieceColor.WHITE and not atTopBorder(self.pos):
-            if not atLeftBorder(self.pos):
-                fields.append(self.pos + NW)
-
-            if not atRightBorder(self.pos):
-                fields.append(self.pos + NE)
-
-        elif self.color == ChessPieceColor.BLACK and not atBottomBorder(self.pos):
-            if not atLeftBorder(self.pos):
-                fields.append(self.pos + SW)
-
-            if not atRightBorder(self.pos):
-                fields.append(self.pos + SE)
+        fields = (
+            WHITE_PAWN_ATTACKS[self.pos]
+            if self.color == ChessPieceColor.WHITE
+            else BLACK_PAWN_ATTACKS[self.pos]
+        )
 
         return [
             field
@@ -291,8 +850,9 @@ class Pawn(Piece):
             if self.board.isOccupied(field) and self.board.getColor(field) != self.color
         ]
 
-    def interact(self, pos: int) -> bool:
-        return super().interact(pos)
+    def moveTo(self, pos: int) -> Move:
+        promotionRow = 1 if self.color == ChessPieceColor.WHITE else 8
+        return Move(self.pos, pos, QUEEN if inRow(pos, promotionRow) else EMPTY)
 
 
 class Knight(Piece):
@@ -300,123 +860,36 @@ class Knight(Piece):
         super().__init__(ChessPieceType.KNIGHT, color, pos, board)
 
     def interactable(self) -> List[int]:
-        fields = list()
-
-        if not atTopBorder(self.pos):
-            if self.pos % 8 > 1:
-                fields.append(self.pos + N + 2 * W)
-
-            if self.pos % 8 < 6:
-                fields.append(self.pos + N + 2 * E)
-
-        if self.pos > 16:
-            if not atLeftBorder(self.pos):
-                fields.append(self.pos + 2 * N + W)
-
-            if not atRightBorder(self.pos):
-                fields.append(self.pos + 2 * N + E)
-
-        if self.pos < 48:
-            if not atLeftBorder(self.pos):
-                fields.append(self.pos + 2 * S + W)
-
-            if not atRightBorder(self.pos):
-                fields.append(self.pos + 2 * S + E)
-
-        if not atBottomBorder(self.pos):
-            if self.pos % 8 > 1:
-                fields.append(self.pos + S + 2 * W)
-
-            if self.pos % 8 < 6:
-                fields.append(self.pos + S + 2 * E)
-
-        return fields
+        return list(KNIGHT_TARGETS[self.pos])
 
 
 class King(Piece):
     def __init__(self, color, pos: int, board: Board):
         super().__init__(ChessPieceType.KING, color, pos, board)
 
-    def interactable(self) -> List[int]:
-        fields = list()
-
-        if not atTopBorder(self.pos):
-            fields.append(self.pos + N)
+    @property
+    def hasMoved(self) -> bool:
+        return not self.board.castling & CASTLING_RIGHTS.get(self.pos, 0)
 
-            if not atLeftBorder(self.pos):
-                fields.append(self.pos + N + W)
-
-            if not atRightBorder(self.pos):
-                fields.append(self.pos + N + E)
-
-        if not atBottomBorder(self.pos):
-            fields.append(self.pos + S)
-
-            if not atLeftBorder(self.pos):
-                fields.append(self.pos + S + W)
-
-            if not atRightBorder(self.pos):
-                fields.append(self.pos + S + E)
-
-        if not atLeftBorder(self.pos):
-            fields.append(self.pos + W)
-
-        if not atRightBorder(self.pos):
-            fields.append(self.pos + E)
-
-        return fields
+    def interactable(self) -> List[int]:
+        return list(KING_TARGETS[self.pos])
 
     def isInCheck(self, pos: int) -> bool:
-        enemies: List[Piece] = [
-            x
-            for x in self.board.fields
-            if self.board.isOccupied(x) and self.board.getColor(x) != self.color
-        ]
-        fieldsInCheck: set = {
-            field for enemy in enemies for field in enemy.attackableFields()
-        }
-        return pos in fieldsInCheck
-
-    def interact(self, pos: int) -> bool:
-        if super().interact(pos):
-            return True
+        return self.board.isAttacked(pos, opponentOf(self.color))
 
+    def moveTo(self, pos: int) -> Move:
         otherPiece = self.board.getPiece(pos)
-        # castling
+        # castling is requested by moving the king onto its own rook, the legal move
+        # generator checks the remaining conditions:
         # Neither the king nor the rook has previously moved.
         # There are no pieces between the king and the rook.
         # The king is not currently in check.
         # The king does not pass through a square that is attacked by an opposing piece.
         # The king does not end up in check. (True of any legal move.)
+        if isinstance(otherPiece, Rook) and otherPiece.color == self.color:
+            return Move(self.pos, self.pos + (2 if self.pos < pos else -2))
 
-        if (
-            self.hasMoved
-            or not isinstance(otherPiece, Rook)
-            or otherPiece.hasMoved
-            or otherPiece.color != self.color
-        ):
-            return False
-
-        inc = 1 if self.pos < pos else -1
-        i = self.pos + inc
-
-        while i != pos and i != self.pos:
-            if self.board.isOccupied(i):
-                return False
-            i += inc
-
-        if self.isInCheck(self.pos) or self.isInCheck(pos):
-            return False
-
-        i = self.pos
-        while i != self.pos and i != pos:
-            if self.isInCheck(i):
-                return False
-            i += inc
-
-        self.board.replace(self.pos, self.pos + 2 * inc)
-        self.board.replace(pos, self.pos - inc)
-        return True
+        return Move(self.pos, pos)
 
 
 class Queen(Piece):
@@ -424,81 +897,7 @@ class Queen(Piece):
         super().__init__(ChessPieceType.QUEEN, color, pos, board)
 
     def interactable(self) -> List[int]:
-        fields = list()
-
-        x = self.pos
-
-        while not atLeftBorder(x) and not atTopBorder(x):  # NW
-            x += NW
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atRightBorder(x) and not atTopBorder(x):  # NE
-            x += NE
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atBottomBorder(x) and not atLeftBorder(x):  # SW
-            x += SW
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atBottomBorder(x) and not atRightBorder(x):  # SE
-            x += SE
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atBottomBorder(x):
-            x += S
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atTopBorder(x):
-            x += N
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atLeftBorder(x):
-            x += W
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        x = self.pos
-
-        while not atRightBorder(x):
-            x += E
-            fields.append(x)
-
-            if self.board.isOccupied(x):
-                break
-
-        return fields
+        return self.slide(QUEEN_RAYS[self.pos])
 
 
 class PieceFactory:
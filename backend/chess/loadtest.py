@@ -0,0 +1,249 @@
+import asyncio
+import json
+import random
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Union
+
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from chess.bots import interaction_target
+from chess.game_logic import PIECE_TYPES
+from chess.models import ChessPieceColor
+from chess.rooms import rooms
+from chess.routing import websocket_urlpatterns
+
+# A load generator for ChessConsumer. Simulated players and spectators talk to the
+# consumer in this process through channels' testing communicator, so no server,
+# network or Redis is involved. The database is the configured one, the queries it
+# receives are part of what is measured.
+
+CONNECT_TIMEOUT = 10
+BROADCAST_TIMEOUT = 10
+
+
+def percentile(values: List[float], p: float) -> Union[float, None]:
+    # nearest rank
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+
+class QueryCounter:
+    # Counts the queries of every database connection, also those opened by the
+    # threads of database_sync_to_async, while counting is set.
+
+    def __init__(self):
+        self.count = 0
+        self.counting = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.counting:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self, sender=None, connection=None, **kwargs):
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+    def __enter__(self):
+        connection_created.connect(self.install)
+        for connection in connections.all(initialized_only=True):
+            self.install(connection=connection)
+        return self
+
+    def __exit__(self, *exc_info):
+        connection_created.disconnect(self.install)
+        for connection in connections.all(initialized_only=True):
+            if self in connection.execute_wrappers:
+                connection.execute_wrappers.remove(self)
+
+
+class Stats:
+    def __init__(self):
+        self.connect_latencies: List[float] = []
+        self.broadcast_latencies: List[float] = []
+        self.messages = 0
+        self.moves = 0
+        self.timeouts = 0
+        self.connect_queries = 0
+        self.move_queries = 0
+        self.elapsed = 0.0
+
+    def report(self) -> Dict[str, object]:
+        def milliseconds(values, p):
+            value = percentile(values, p)
+            return None if value is None else round(value * 1000, 2)
+
+        return {
+            "connections": len(self.connect_latencies),
+            "connect_ms": {
+                f"p{p}": milliseconds(self.connect_latencies, p) for p in (50, 95, 99)
+            },
+            "moves": self.moves,
+            "broadcast_ms": {
+                f"p{p}": milliseconds(self.broadcast_latencies, p) for p in (50, 95, 99)
+            },
+            "timeouts": self.timeouts,
+            "seconds": round(self.elapsed, 2),
+            "moves_per_second": (
+                round(self.moves / self.elapsed, 1) if self.elapsed else None
+            ),
+            "messages_per_second": (
+                round(self.messages / self.elapsed, 1) if self.elapsed else None
+            ),
+            "queries_per_connect": (
+                round(self.connect_queries / len(self.connect_latencies), 2)
+                if self.connect_latencies
+                else None
+            ),
+            "queries_per_move": (
+                round(self.move_queries / self.moves, 2) if self.moves else None
+            ),
+        }
+
+
+def session_application(session_key: str):
+    # the consumer as routed in production, with a fixed session instead of cookies
+    application = URLRouter(websocket_urlpatterns)
+
+    async def with_session(scope, receive, send):
+        scope = dict(scope, session=SimpleNamespace(session_key=session_key))
+        return await application(scope, receive, send)
+
+    return with_session
+
+
+def seat_key(match_id: int, color: str) -> str:
+    return f"loadtest-{match_id}-{color}"
+
+
+class RoomDriver:
+    # The two players and the spectators of one room. The players alternate random
+    # legal moves, each waiting until the previous move reached every socket.
+
+    def __init__(self, match_id: int, spectators: int, stats: Stats):
+        self.match_id = match_id
+        self.stats = stats
+        self.keys = [
+            seat_key(match_id, ChessPieceColor.WHITE),
+            seat_key(match_id, ChessPieceColor.BLACK),
+        ] + [f"loadtest-{match_id}-spectator-{i}" for i in range(spectators)]
+        self.sockets: List[WebsocketCommunicator] = []
+        self.receivers: List[asyncio.Task] = []
+        self.sent: Dict[int, float] = {}  # send time of every seq
+        self.delivered: Dict[int, int] = {}  # sockets a seq has reached
+        self.complete = asyncio.Event()
+
+    async def connect(self):
+        self.sockets = await asyncio.gather(*(self.open(key) for key in self.keys))
+
+    async def open(self, session_key: str) -> WebsocketCommunicator:
+        socket = WebsocketCommunicator(
+            session_application(session_key), f"/ws/chess/room/{self.match_id}"
+        )
+        start = time.monotonic()
+        connected, _ = await socket.connect(timeout=CONNECT_TIMEOUT)
+        if not connected:
+            raise RuntimeError(f"Connecting to room {self.match_id} failed.")
+        await socket.receive_from(timeout=CONNECT_TIMEOUT)  # the state
+        self.stats.connect_latencies.append(time.monotonic() - start)
+        return socket
+
+    async def receive(self, socket: WebsocketCommunicator):
+        while True:
+            message = json.loads(await socket.receive_from(timeout=None))
+            received = time.monotonic()
+            self.stats.messages += 1
+            if message["type"] != "interaction" or message["seq"] not in self.sent:
+                continue
+
+            seq = message["seq"]
+            self.stats.broadcast_latencies.append(received - self.sent[seq])
+            self.delivered[seq] = self.delivered.get(seq, 0) + 1
+            if self.delivered[seq] == len(self.sockets):
+                self.complete.set()
+
+    async def play(self, plies: int, think: float, rng: random.Random):
+        self.receivers = [
+            asyncio.ensure_future(self.receive(socket)) for socket in self.sockets
+        ]
+        room = rooms.get(self.match_id)
+
+        for _ in range(plies):
+            board = room.board
+            moves = board.generateLegalMoves()
+            if not moves:
+                break  # the game is over
+
+            move = rng.choice(moves)
+            data = {
+                "source": move.source,
+                "target": interaction_target(board, move),
+            }
+            if move.promotion:
+                data["promotion"] = PIECE_TYPES[move.promotion]
+            player = self.sockets[0 if board.turn == ChessPieceColor.WHITE else 1]
+
+            seq = room.seq + 1
+            self.complete.clear()
+            self.sent[seq] = time.monotonic()
+            await player.send_to(json.dumps({"type": "interaction", "data": data}))
+            try:
+                await asyncio.wait_for(self.complete.wait(), BROADCAST_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.stats.timeouts += 1
+                break
+            self.stats.moves += 1
+
+            if think:
+                await asyncio.sleep(think * rng.uniform(0.5, 1.5))
+
+    async def close(self):
+        for receiver in self.receivers:
+            receiver.cancel()
+        await asyncio.gather(*self.receivers, return_exceptions=True)
+        for socket in self.sockets:
+            await socket.disconnect()
+
+
+async def run_load(
+    match_ids: List[int],
+    spectators: int,
+    plies: int,
+    think: float = 0.0,
+    seed: Union[int, None] = None,
+) -> Stats:
+    # Connects two players and the spectators to every room, then plays plies random
+    # moves in all rooms at once. The rooms' matches must exist with the seats of
+    # seat_key and an in-memory channel layer must be configured.
+    stats = Stats()
+    rng = random.Random(seed)
+    drivers = [RoomDriver(match_id, spectators, stats) for match_id in match_ids]
+
+    with QueryCounter() as queries:
+        queries.counting = True
+        try:
+            await asyncio.gather(*(driver.connect() for driver in drivers))
+            stats.connect_queries, queries.count = queries.count, 0
+
+            start = time.monotonic()
+            await asyncio.gather(
+                *(
+                    driver.play(plies, think, random.Random(rng.random()))
+                    for driver in drivers
+                )
+            )
+            stats.elapsed = time.monotonic() - start
+        finally:
+            # moves still buffered are written when the players leave
+            for driver in drivers:
+                await driver.close()
+            stats.move_queries = queries.count
+            queries.counting = False
+
+    return stats
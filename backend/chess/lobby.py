@@ -0,0 +1,31 @@
+import hashlib
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+
+# The first page of the room listing is what idle clients poll, it is cached for a
+# few seconds. Claiming a seat or creating a room bumps the version in the key of
+# every cached page. With a per process cache backend other processes may serve the
+# previous page until it expires.
+
+VERSION_KEY = "chess:lobby:version"
+
+
+def invalidate_lobby():
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:  # not cached yet or evicted
+        cache.set(VERSION_KEY, 1, None)
+
+
+def cached_first_page(url: str, build: Callable[[], dict]) -> dict:
+    version = cache.get_or_set(VERSION_KEY, 0, None)
+    key = f"chess:lobby:{version}:{hashlib.md5(url.encode()).hexdigest()}"
+
+    data = cache.get(key)
+    if data is None:
+        data = build()
+        cache.set(key, data, getattr(settings, "CHESS_LOBBY_CACHE_TTL", 5))
+
+    return data
@@ -0,0 +1,76 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chess.analysis import analyse_positions, match_positions
+
+
+class Command(BaseCommand):
+    help = "Analyses positions in parallel and prints the best move, score and number of legal moves of each as one JSON line, as soon as it is known."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--fen", action="append", default=[], help="A position to analyse."
+        )
+        parser.add_argument(
+            "--file", help="File with one FEN per line, - reads standard input."
+        )
+        parser.add_argument(
+            "--match",
+            type=int,
+            action="append",
+            default=[],
+            help="Id of a match whose current position is analysed.",
+        )
+        parser.add_argument(
+            "--all-matches",
+            action="store_true",
+            help="Analyses the current positions of all matches.",
+        )
+        parser.add_argument("--depth", type=int, default=4, help="Search depth.")
+        parser.add_argument(
+            "--time-limit",
+            type=float,
+            default=1.0,
+            help="Seconds per position, 0 searches every position to full depth.",
+        )
+        parser.add_argument(
+            "--workers", type=int, help="Worker processes, one per core by default."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=16,
+            help="Positions sent to a worker at once.",
+        )
+
+    def handle(self, *args, **options):
+        if options["depth"] < 1 or options["chunk_size"] < 1:
+            raise CommandError("depth and chunk size must be positive.")
+
+        results = analyse_positions(
+            self.positions(options),
+            options["depth"],
+            options["time_limit"] or None,
+            options["workers"],
+            options["chunk_size"],
+        )
+        for analysis in results:
+            self.stdout.write(json.dumps(analysis._asdict()))
+
+    def positions(self, options):
+        for fen in options["fen"]:
+            yield fen, fen
+
+        if options["file"]:
+            lines = sys.stdin if options["file"] == "-" else open(options["file"])
+            with lines:
+                for line in lines:
+                    if line.strip():
+                        yield line.strip(), line.strip()
+
+        if options["match"]:
+            yield from match_positions(options["match"])
+        elif options["all_matches"]:
+            yield from match_positions()
@@ -0,0 +1,88 @@
+from typing import Dict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chess.book import write_book
+from chess.pgn import open_text, read_games, replay
+
+
+def prune(counts: Dict[tuple, int], size: int) -> Dict[tuple, int]:
+    # drops the moves seen least often until at most size are left
+    threshold = 1
+    while len(counts) > size:
+        counts = {entry: count for entry, count in counts.items() if count > threshold}
+        threshold += 1
+    return counts
+
+
+class Command(BaseCommand):
+    help = "Builds the opening book from PGN files: counts how often each move has been played in each position of the first plies of the games and writes the counts as a sorted book file that the engine reads memory-mapped."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "files",
+            nargs="+",
+            help="PGN files, also .gz or .bz2 compressed, - reads standard input.",
+        )
+        parser.add_argument(
+            "--output",
+            default=getattr(settings, "CHESS_OPENING_BOOK", None),
+            help="Path of the book, the CHESS_OPENING_BOOK setting by default.",
+        )
+        parser.add_argument(
+            "--max-ply",
+            type=int,
+            default=24,
+            help="Plies of every game that go into the book.",
+        )
+        parser.add_argument(
+            "--min-count",
+            type=int,
+            default=1,
+            help="Moves played less often than this are left out.",
+        )
+        parser.add_argument(
+            "--max-entries",
+            type=int,
+            default=2_000_000,
+            help="Moves counted in memory at most. Beyond that the moves seen least often are dropped, so rare moves may be undercounted.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["output"]:
+            raise CommandError("No output path given.")
+        if min(options["max_ply"], options["min_count"], options["max_entries"]) < 1:
+            raise CommandError("max ply, min count and max entries must be positive.")
+
+        counts = {}
+        games = rejected = 0
+
+        for path in options["files"]:
+            with open_text(path) as lines:
+                for game in read_games(lines):
+                    games += 1
+                    try:
+                        for ply, (board, move) in enumerate(replay(game)):
+                            if ply >= options["max_ply"]:
+                                break
+                            entry = (board.hash, move)
+                            counts[entry] = counts.get(entry, 0) + 1
+                    except ValueError as e:
+                        # the moves before the illegal one are still counted
+                        rejected += 1
+                        self.stderr.write(f"Game {games}: {e}")
+
+                    if len(counts) > options["max_entries"]:
+                        counts = prune(counts, options["max_entries"] // 2)
+
+        counts = {
+            entry: count
+            for entry, count in counts.items()
+            if count >= options["min_count"]
+        }
+        write_book(options["output"], counts)
+        self.stdout.write(
+            f"Wrote {len(counts)} moves from {games} games ({rejected} with illegal "
+            f"moves) to {options['output']}."
+        )
@@ -0,0 +1,71 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chess.tablebase import (
+    DEFAULT_MATERIALS,
+    MAX_PIECES,
+    Tablebases,
+    generate,
+    generation_order,
+)
+
+
+class Command(BaseCommand):
+    help = f"Builds endgame tablebases of up to {MAX_PIECES} pieces by retrograde analysis, together with the smaller tables their captures and promotions lead to. Tables that exist are kept unless --force is given."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "materials",
+            nargs="*",
+            default=list(DEFAULT_MATERIALS),
+            help=f"Materials like KRK or KQKR, {' '.join(DEFAULT_MATERIALS)} by default.",
+        )
+        parser.add_argument(
+            "--directory",
+            default=getattr(settings, "CHESS_TABLEBASE_DIR", None),
+            help="Where the tables are written, the CHESS_TABLEBASE_DIR setting by default.",
+        )
+        parser.add_argument(
+            "--workers", type=int, help="Worker processes, one per core by default."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=4096,
+            help="Positions scanned by a worker at once.",
+        )
+        parser.add_argument(
+            "--force", action="store_true", help="Rebuilds existing tables."
+        )
+
+    def handle(self, *args, **options):
+        directory = options["directory"]
+        if not directory:
+            raise CommandError("No directory given.")
+        if options["chunk_size"] < 1:
+            raise CommandError("chunk size must be positive.")
+
+        try:
+            order = generation_order([name.upper() for name in options["materials"]])
+        except ValueError as e:
+            raise CommandError(f"{e} Materials are written like KRK.")
+        if any(len(name) > MAX_PIECES for name in order):
+            raise CommandError(f"Tables have at most {MAX_PIECES} pieces.")
+
+        os.makedirs(directory, exist_ok=True)
+        for name in order:
+            if (
+                os.path.exists(Tablebases(directory).path(name))
+                and not options["force"]
+            ):
+                self.stdout.write(f"{name} exists.")
+                continue
+
+            start = time.monotonic()
+            path = generate(name, directory, options["workers"], options["chunk_size"])
+            self.stdout.write(
+                f"Built {path} in {time.monotonic() - start:.1f} seconds."
+            )
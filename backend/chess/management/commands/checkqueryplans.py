@@ -0,0 +1,66 @@
+import re
+from datetime import timedelta
+from typing import Dict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from chess.models import ChessMatchModel, ChessPieceModel, MoveModel
+
+# full table scans in the plans of SQLite and PostgreSQL, SQLite scans that walk an
+# index in order are fine
+FULL_SCAN = re.compile(r"\bSCAN (?!.*\bUSING\b)|Seq Scan")
+
+
+def hot_queries():
+    # the queries the app runs on every move, connect or lobby poll
+    return {
+        "piece rows of a match by field": ChessPieceModel.objects.filter(
+            chess_match_id=1, pos=0
+        ),
+        "moves after a snapshot": MoveModel.objects.filter(
+            chess_match_id=1, ply__gt=20
+        ).order_by("ply"),
+        "room listing": ChessMatchModel.objects.filter(
+            pooled=False, archived=False
+        ).order_by("-last_accessed", "-id")[:100],
+        "stale matches": ChessMatchModel.objects.filter(
+            pooled=False,
+            archived=False,
+            last_accessed__lt=timezone.now() - timedelta(days=30),
+        ).order_by("last_accessed")[:500],
+        "white seat": ChessMatchModel.objects.filter(white="session"),
+        "black seat": ChessMatchModel.objects.filter(black="session"),
+    }
+
+
+def query_plans() -> Dict[str, str]:
+    # the plans of the hot queries by name, also run by the tests
+    plans = dict()
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            # small tables are cheaper to scan, ask whether an index could be used
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+        for name, queryset in hot_queries().items():
+            plans[name] = queryset.explain()
+    return plans
+
+
+class Command(BaseCommand):
+    help = "Checks that the hot queries of the app are served by indexes instead of full table scans, fails otherwise."
+
+    def handle(self, *args, **options):
+        failed = list()
+
+        for name, plan in query_plans().items():
+            self.stdout.write(f"{name}:\n{plan}\n")
+            if FULL_SCAN.search(plan):
+                failed.append(name)
+
+        if failed:
+            raise CommandError(f"Full table scans in: {', '.join(failed)}")
+
+        self.stdout.write("All hot queries use indexes.")
@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chess.archive import export_games
+from chess.models import ChessMatchModel
+
+
+class Command(BaseCommand):
+    help = "Exports matches as PGN, streaming them from the database in chunks. Matches whose moves do not reach back to the start of the game are exported as their current position. Imported games keep their result, their other tags such as the players are not stored."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--match",
+            type=int,
+            action="append",
+            default=[],
+            help="Id of a match to export, all matches by default.",
+        )
+        parser.add_argument(
+            "--output", default="-", help="File to write, - writes standard output."
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=500,
+            help="Matches fetched from the database at once.",
+        )
+
+    def handle(self, *args, **options):
+        if options["chunk_size"] < 1:
+            raise CommandError("chunk size must be positive.")
+
+        matches = ChessMatchModel.objects.all()
+        if options["match"]:
+            matches = matches.filter(id__in=options["match"])
+
+        output = (
+            sys.stdout if options["output"] == "-" else open(options["output"], "w")
+        )
+        with output:
+            for game in export_games(matches, options["chunk_size"]):
+                output.write(game + "\n")
@@ -0,0 +1,51 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+
+from chess.archive import import_games
+from chess.pgn import open_text, read_games
+
+
+class Command(BaseCommand):
+    help = "Imports the games of PGN files as archived matches, which are kept for analysis and export but not listed, played or reaped. The files are read as a stream and every move is checked against the rules, games with illegal moves are skipped and reported. Files ending in .gz or .bz2 are decompressed on the fly."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "files", nargs="+", help="PGN files, - reads standard input."
+        )
+        parser.add_argument(
+            "--first-id",
+            type=int,
+            help="Id of the first imported match, after the highest id in use by default.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Games written per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("batch size must be positive.")
+
+        self.imported = self.rejected = 0
+        self.first_id = options["first_id"]
+        try:
+            for path in options["files"]:
+                self.import_file(path, options["batch_size"])
+        except IntegrityError:
+            raise CommandError(
+                f"Match ids from {self.first_id} on are taken, pass a free --first-id."
+            )
+
+        self.stdout.write(f"Imported {self.imported} games, skipped {self.rejected}.")
+
+    def import_file(self, path: str, batch_size: int):
+        with open_text(path) as lines:
+            for result in import_games(read_games(lines), self.first_id, batch_size):
+                if result.match_id is None:
+                    self.rejected += 1
+                    self.stderr.write(f"{path} game {result.number}: {result.error}")
+                else:
+                    self.imported += 1
+                    self.first_id = result.match_id + 1
@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from chess.loadtest import run_load, seat_key
+from chess.models import ChessMatchModel, ChessPieceColor
+from chess.provisioning import START_POSITION
+
+
+class Command(BaseCommand):
+    help = "Measures the capacity of the websocket consumer: simulated players and spectators connect to a number of rooms through an in-memory channel layer, play random moves and the connect latency, move to broadcast latency, message rate and database queries per move are reported. The rooms are created in the configured database for the run and deleted afterwards."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--rooms", type=int, default=10, help="Rooms played in at once."
+        )
+        parser.add_argument(
+            "--spectators", type=int, default=2, help="Spectators per room."
+        )
+        parser.add_argument(
+            "--plies", type=int, default=40, help="Moves played per room."
+        )
+        parser.add_argument(
+            "--think",
+            type=float,
+            default=0.0,
+            help="Average seconds between the moves of a room, 0 moves at once.",
+        )
+        parser.add_argument(
+            "--first-room",
+            type=int,
+            default=900000000,
+            help="Id of the first room, the ids of all rooms must be free.",
+        )
+        parser.add_argument("--seed", type=int, help="Seed of the random moves.")
+        parser.add_argument(
+            "--json", action="store_true", help="Prints the report as JSON."
+        )
+
+    def handle(self, *args, **options):
+        if options["rooms"] < 1 or options["plies"] < 1 or options["spectators"] < 0:
+            raise CommandError("rooms and plies must be positive.")
+
+        match_ids = list(
+            range(options["first_room"], options["first_room"] + options["rooms"])
+        )
+        if ChessMatchModel.objects.filter(id__in=match_ids).exists():
+            raise CommandError("Some of the room ids are taken, pass --first-room.")
+
+        ChessMatchModel.objects.bulk_create(
+            ChessMatchModel(
+                id=match_id,
+                position=START_POSITION,
+                white=seat_key(match_id, ChessPieceColor.WHITE),
+                black=seat_key(match_id, ChessPieceColor.BLACK),
+            )
+            for match_id in match_ids
+        )
+        try:
+            with override_settings(
+                CHANNEL_LAYERS={
+                    "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+                }
+            ):
+                stats = asyncio.run(
+                    run_load(
+                        match_ids,
+                        options["spectators"],
+                        options["plies"],
+                        options["think"],
+                        options["seed"],
+                    )
+                )
+        finally:
+            ChessMatchModel.objects.filter(id__in=match_ids).delete()
+
+        report = stats.report()
+        if options["json"]:
+            self.stdout.write(json.dumps(report))
+            return
+
+        for key, value in report.items():
+            if isinstance(value, dict):
+                value = "  ".join(f"{name} {number}" for name, number in value.items())
+            self.stdout.write(f"{key.replace('_', ' ')}: {value}")
@@ -0,0 +1,94 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from chess.game_logic import Board, START_FEN
+
+# reference positions with their known node counts per depth, see
+# https://www.chessprogramming.org/Perft_Results
+PERFT_POSITIONS = [
+    ("initial", START_FEN, [20, 400, 8902, 197281, 4865609]),
+    (
+        "kiwipete",
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        [48, 2039, 97862, 4085603],
+    ),
+    (
+        "position 3",
+        "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+        [14, 191, 2812, 43238, 674624],
+    ),
+    (
+        "position 4",
+        "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+        [6, 264, 9467, 422333],
+    ),
+    (
+        "position 5",
+        "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+        [44, 1486, 62379, 2103487],
+    ),
+    (
+        "position 6",
+        "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+        [46, 2079, 89890, 3894594],
+    ),
+]
+
+
+class Command(BaseCommand):
+    help = "Counts the legal move tree of reference positions to verify the move generator and measure its speed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=3,
+            help="Maximum depth to search in every position.",
+        )
+        parser.add_argument(
+            "--fen",
+            help="Run on the given position instead of the reference positions.",
+        )
+
+    def handle(self, *args, **options):
+        depth = options["depth"]
+        positions = (
+            [("custom", options["fen"], [])] if options["fen"] else PERFT_POSITIONS
+        )
+        failures = 0
+        totalNodes, totalTime = 0, 0.0
+
+        for name, fen, expected in positions:
+            try:
+                board = Board.fromFen(fen)
+            except ValueError as e:
+                raise CommandError(e)
+
+            for d in range(1, min(depth, len(expected) or depth) + 1):
+                start = time.perf_counter()
+                nodes = board.perft(d)
+                elapsed = time.perf_counter() - start
+                totalNodes += nodes
+                totalTime += elapsed
+
+                status = ""
+                if d <= len(expected):
+                    if nodes == expected[d - 1]:
+                        status = "ok"
+                    else:
+                        status = f"FAILED, expected {expected[d - 1]}"
+                        failures += 1
+
+                self.stdout.write(
+                    f"{name:<12} depth {d}: {nodes:>10} nodes "
+                    f"{nodes / elapsed if elapsed else 0:>10.0f} nodes/s {status}"
+                )
+
+        self.stdout.write(
+            f"total: {totalNodes} nodes in {totalTime:.2f}s, "
+            f"{totalNodes / totalTime if totalTime else 0:.0f} nodes/s"
+        )
+
+        if failures:
+            raise CommandError(f"{failures} perft counts did not match.")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from chess.provisioning import provision_matches
+
+
+class Command(BaseCommand):
+    help = "Pre-creates a pool of rooms in the starting position that players can claim instantly, e.g. before a tournament starts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("start", type=int, help="First room id of the pool.")
+        parser.add_argument("count", type=int, help="Number of rooms to create.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Rooms created per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if options["count"] < 1 or options["batch_size"] < 1:
+            raise CommandError("count and batch size must be positive.")
+
+        match_ids = list(range(options["start"], options["start"] + options["count"]))
+        created = provision_matches(match_ids, options["batch_size"])
+        self.stdout.write(
+            f"Provisioned {created} rooms, {len(match_ids) - created} ids were taken."
+        )
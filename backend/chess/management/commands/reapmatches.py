@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from chess.provisioning import reap_stale_matches
+
+
+class Command(BaseCommand):
+    help = "Deletes matches that have not been accessed for longer than the TTL, together with their pieces and moves. Meant to run periodically, e.g. from cron."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl",
+            type=float,
+            default=getattr(settings, "CHESS_MATCH_TTL", 30 * 24 * 60 * 60),
+            help="Seconds since the last access after which a match is deleted.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Matches deleted per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        if options["ttl"] <= 0 or options["batch_size"] < 1:
+            raise CommandError("TTL and batch size must be positive.")
+
+        deleted = reap_stale_matches(
+            timedelta(seconds=options["ttl"]), options["batch_size"]
+        )
+        self.stdout.write(f"Deleted {deleted} stale matches.")
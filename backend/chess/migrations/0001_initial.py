@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="ChessMatchModel",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                ("last_accessed", models.DateTimeField(auto_now_add=True)),
+                ("white", models.CharField(max_length=40, null=True)),
+                ("black", models.CharField(max_length=40, null=True)),
+                (
+                    "turn",
+                    models.CharField(
+                        choices=[("B", "Black"), ("W", "White")],
+                        default="W",
+                        max_length=1,
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["last_accessed"],
+            },
+        ),
+        migrations.CreateModel(
+            name="ChessPieceModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "pos",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MinValueValidator(0),
+                            django.core.validators.MaxValueValidator(63),
+                        ]
+                    ),
+                ),
+                (
+                    "type",
+                    models.CharField(
+                        choices=[
+                            ("KI", "King"),
+                            ("QU", "Queen"),
+                            ("RO", "Rook"),
+                            ("BI", "Bishop"),
+                            ("KN", "Knight"),
+                            ("PA", "Pawn"),
+                        ],
+                        max_length=2,
+                    ),
+                ),
+                (
+                    "color",
+                    models.CharField(
+                        choices=[("B", "Black"), ("W", "White")], max_length=1
+                    ),
+                ),
+                (
+                    "chess_match",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pieces",
+                        to="chess.chessmatchmodel",
+                    ),
+                ),
+            ],
+        ),
+    ]
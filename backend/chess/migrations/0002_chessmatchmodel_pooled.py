@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chess", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chessmatchmodel",
+            name="pooled",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chess", "0002_chessmatchmodel_pooled"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chessmatchmodel",
+            name="position",
+            field=models.BinaryField(max_length=38, null=True),
+        ),
+    ]
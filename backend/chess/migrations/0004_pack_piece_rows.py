@@ -0,0 +1,95 @@
+import struct
+from collections import defaultdict
+
+from django.db import migrations
+
+# A frozen copy of the packing of game_logic.Board.pack, so that this migration keeps
+# working when the board code changes.
+
+PIECE_CODES = {"PA": 1, "KN": 2, "BI": 3, "RO": 4, "QU": 5, "KI": 6}
+PIECE_TYPES = {code: piece_type for piece_type, code in PIECE_CODES.items()}
+BLACK = 8
+PACKED_TAIL = struct.Struct(">BBHH")
+NO_EP = 255
+BATCH_SIZE = 500
+
+# king field, rook field, color bit and castling right
+CASTLINGS = ((60, 63, 0, 1), (60, 56, 0, 2), (4, 7, BLACK, 4), (4, 0, BLACK, 8))
+
+
+def pack(squares, turn):
+    # piece rows carry no history, so kings and rooks on their home fields keep their
+    # castling rights, as when boards were built from the rows
+    castling = 0
+    for king, rook, color, right in CASTLINGS:
+        if squares[king] == 6 | color and squares[rook] == 4 | color:
+            castling |= right
+
+    fields = bytes(squares[i] << 4 | squares[i + 1] for i in range(0, 64, 2))
+    return fields + PACKED_TAIL.pack(castling | (16 if turn == "B" else 0), NO_EP, 0, 1)
+
+
+def pack_piece_rows(apps, schema_editor):
+    ChessMatchModel = apps.get_model("chess", "ChessMatchModel")
+    ChessPieceModel = apps.get_model("chess", "ChessPieceModel")
+    match_ids = list(
+        ChessMatchModel.objects.filter(position__isnull=True).values_list(
+            "id", flat=True
+        )
+    )
+
+    for i in range(0, len(match_ids), BATCH_SIZE):
+        batch = match_ids[i : i + BATCH_SIZE]
+        squares = defaultdict(lambda: bytearray(64))
+
+        for match_id, pos, piece_type, color in ChessPieceModel.objects.filter(
+            chess_match_id__in=batch
+        ).values_list("chess_match_id", "pos", "type", "color"):
+            squares[match_id][pos] = PIECE_CODES[piece_type] | (
+                BLACK if color == "B" else 0
+            )
+
+        matches = list(ChessMatchModel.objects.filter(id__in=batch))
+        for chess_match in matches:
+            chess_match.position = pack(squares[chess_match.id], chess_match.turn)
+
+        ChessMatchModel.objects.bulk_update(matches, ["position"])
+        ChessPieceModel.objects.filter(chess_match_id__in=batch).delete()
+
+
+def unpack_to_piece_rows(apps, schema_editor):
+    ChessMatchModel = apps.get_model("chess", "ChessMatchModel")
+    ChessPieceModel = apps.get_model("chess", "ChessPieceModel")
+
+    for chess_match in ChessMatchModel.objects.filter(position__isnull=False).iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        position = bytes(chess_match.position)
+        pieces = list()
+
+        for i, byte in enumerate(position[:32]):
+            for pos, code in ((2 * i, byte >> 4), (2 * i + 1, byte & 15)):
+                if code:
+                    pieces.append(
+                        ChessPieceModel(
+                            chess_match_id=chess_match.id,
+                            pos=pos,
+                            type=PIECE_TYPES[code & 7],
+                            color="B" if code & BLACK else "W",
+                        )
+                    )
+
+        ChessPieceModel.objects.bulk_create(pieces)
+
+    ChessMatchModel.objects.update(position=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chess", "0003_chessmatchmodel_position"),
+    ]
+
+    operations = [
+        migrations.RunPython(pack_piece_rows, unpack_to_piece_rows),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.18 on 2026-10-18 16:55
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chess", "0004_pack_piece_rows"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MoveModel",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("ply", models.IntegerField()),
+                (
+                    "source",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MinValueValidator(0),
+                            django.core.validators.MaxValueValidator(63),
+                        ]
+                    ),
+                ),
+                (
+                    "target",
+                    models.IntegerField(
+                        validators=[
+                            django.core.validators.MinValueValidator(0),
+                            django.core.validators.MaxValueValidator(63),
+                        ]
+                    ),
+                ),
+                (
+                    "promotion",
+                    models.CharField(
+                        choices=[
+                            ("KI", "King"),
+                            ("QU", "Queen"),
+                            ("RO", "Rook"),
+                            ("BI", "Bishop"),
+                            ("KN", "Knight"),
+                            ("PA", "Pawn"),
+                        ],
+                        max_length=2,
+                        null=True,
+                    ),
+                ),
+                ("timestamp", models.DateTimeField(auto_now_add=True)),
+                (
+                    "chess_match",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="moves",
+                        to="chess.chessmatchmodel",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("chess_match", "ply"), name="unique_move_ply"
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chess", "0005_movemodel"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="chessmatchmodel",
+            index=models.Index(
+                fields=["last_accessed", "id"], name="match_last_accessed"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="chessmatchmodel",
+            index=models.Index(fields=["white"], name="match_white"),
+        ),
+        migrations.AddIndex(
+            model_name="chessmatchmodel",
+            index=models.Index(fields=["black"], name="match_black"),
+        ),
+        migrations.AddConstraint(
+            model_name="chesspiecemodel",
+            constraint=models.UniqueConstraint(
+                fields=("chess_match", "pos"), name="unique_piece_pos"
+            ),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chess", "0006_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chessmatchmodel",
+            name="engine",
+            field=models.CharField(
+                choices=[("B", "Black"), ("W", "White")], max_length=1, null=True
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chess", "0007_chessmatchmodel_engine"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chessmatchmodel",
+            name="archived",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chess", "0008_chessmatchmodel_archived"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="chessmatchmodel",
+            name="result",
+            field=models.CharField(max_length=7, null=True),
+        ),
+    ]
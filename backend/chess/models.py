@@ -35,9 +35,27 @@ class ChessMatchModel(models.Model):
         null=False,
         blank=False,
     )
+    # the position packed by game_logic.Board.pack, a snapshot that is completed by
+    # replaying the moves logged after it
+    position = models.BinaryField(max_length=38, null=True)
+    # provisioned ahead of time and not yet claimed by a player, see chess.provisioning
+    pooled = models.BooleanField(default=False)
+    # the color played by the computer in games against the engine, see chess.bots
+    engine = models.CharField(max_length=1, choices=ChessPieceColor.choices, null=True)
+    # imported from a game archive for analysis, never listed, played or reaped, see
+    # chess.archive
+    archived = models.BooleanField(default=False)
+    # the result of an archived game as given by its PGN, e.g. 1-0 after a resignation
+    result = models.CharField(max_length=7, null=True)
 
     class Meta:
         ordering = ["last_accessed"]
+        indexes = [
+            # room listing, reaper and seat lookups, verified by checkqueryplans
+            models.Index(fields=["last_accessed", "id"], name="match_last_accessed"),
+            models.Index(fields=["white"], name="match_white"),
+            models.Index(fields=["black"], name="match_black"),
+        ]
 
 
 class ChessPieceModel(models.Model):
@@ -49,3 +67,35 @@ class ChessPieceModel(models.Model):
     )
     type = models.CharField(max_length=2, choices=ChessPieceType.choices, null=False)
     color = models.CharField(max_length=1, choices=ChessPieceColor.choices, null=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["chess_match", "pos"], name="unique_piece_pos"
+            )
+        ]
+
+
+class MoveModel(models.Model):
+    # append-only log of the moves of a match, see chess.persistence
+    chess_match = models.ForeignKey(
+        ChessMatchModel, related_name="moves", on_delete=models.CASCADE
+    )
+    ply = models.IntegerField(null=False)
+    source = models.IntegerField(
+        validators=[MinValueValidator(0), MaxValueValidator(63)], null=False
+    )
+    target = models.IntegerField(
+        validators=[MinValueValidator(0), MaxValueValidator(63)], null=False
+    )
+    promotion = models.CharField(
+        max_length=2, choices=ChessPieceType.choices, null=True
+    )
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["chess_match", "ply"], name="unique_move_ply"
+            )
+        ]
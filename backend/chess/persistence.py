@@ -0,0 +1,256 @@
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Tuple, Union
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from chess.game_logic import (
+    Board,
+    EMPTY,
+    Move,
+    PIECE_CODES,
+    encodePiece,
+    pieceTypeOf,
+)
+from chess.models import ChessMatchModel, MoveModel
+
+
+def load_board(chess_match: ChessMatchModel) -> Board:
+    # The latest snapshot and the moves logged after it. The replay stops at a gap
+    # in the log or at a move that is not legal, the board is then the last position
+    # the log is consistent with.
+    board = load_snapshot(chess_match)
+    for ply, source, target, promotion in (
+        chess_match.moves.filter(ply__gt=board.ply)
+        .order_by("ply")
+        .values_list("ply", "source", "target", "promotion")
+    ):
+        move = Move(source, target, PIECE_CODES.get(promotion, EMPTY))
+        if (
+            ply != board.ply + 1
+            or move not in board.generatePseudoMoves()
+            or not board.isLegal(move)
+        ):
+            logging.error(
+                "The move log of match %d breaks off before ply %d.",
+                chess_match.id,
+                ply,
+            )
+            break
+        board.makeMove(move)
+
+    return board
+
+
+def load_snapshot(chess_match: ChessMatchModel) -> Board:
+    if chess_match.position is not None:
+        return Board.unpack(bytes(chess_match.position))
+
+    # matches that have not been migrated to packed positions yet
+    board = Board()
+    for pos, piece_type, color in chess_match.pieces.values_list(
+        "pos", "type", "color"
+    ):
+        board.squares[pos] = encodePiece(piece_type, color)
+
+    board.turn = chess_match.turn
+    board.castling = board.inferCastlingRights()
+    board.rebuildAttacks()
+    board.rebuildHash()
+    return board
+
+
+def write_moves(moves: List[MoveModel], snapshots: Dict[int, Tuple[bytes, str]]):
+    # Appends the moves to the log and updates the snapshots of the matches in one
+    # transaction, with one INSERT and at most one UPDATE.
+    with transaction.atomic():
+        MoveModel.objects.bulk_create(moves)
+        if snapshots:
+            ChessMatchModel.objects.bulk_update(
+                [
+                    ChessMatchModel(id=match_id, position=position, turn=turn)
+                    for match_id, (position, turn) in snapshots.items()
+                ],
+                ["position", "turn"],
+            )
+
+
+class TimedFlush:
+    # Base of the write buffers below: once something is pending, a timer thread
+    # flushes it after interval seconds, retrying with the next interval on errors.
+
+    description = "buffered changes"
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.pending: dict = {}
+        self.lock = threading.Lock()
+        self.timer: Union[threading.Timer, None] = None
+
+    def start_timer(self):
+        # called with the lock held
+        if self.timer is None and self.pending:
+            self.timer = threading.Timer(self.interval, self.flush_from_timer)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        raise NotImplementedError
+
+    def flush_from_timer(self):
+        with self.lock:
+            self.timer = None
+
+        try:
+            self.flush()
+        except Exception:
+            logging.exception("Writing %s failed.", self.description)
+            with self.lock:
+                self.start_timer()
+        finally:
+            connection.close()
+
+
+class WriteBehind(TimedFlush):
+    # Collects the moves of all rooms and writes them to the move log. A snapshot of
+    # the position is stored every snapshot_interval plies, so that loading a board
+    # replays at most that many moves. With an interval of 0 the moves are meant to be
+    # flushed right after they are recorded, otherwise the moves of all rooms are
+    # written once the interval has passed. Every room is written in a transaction of
+    # its own, so a room whose moves cannot be stored does not hold up the others.
+
+    description = "chess moves"
+
+    def __init__(self, interval: float, snapshot_interval: int):
+        super().__init__(interval)
+        self.snapshot_interval = max(snapshot_interval, 1)
+        self.pending: Dict[int, List[MoveModel]] = {}
+        self.snapshots: Dict[int, Tuple[bytes, str]] = {}
+
+    def record(self, match_id: int, board: Board):
+        # Records the last move of the board. Called right after the move on the
+        # thread owning the board, the database is not accessed.
+        move = board.lastMove()
+        entry = MoveModel(
+            chess_match_id=match_id,
+            ply=board.ply,
+            source=move.source,
+            target=move.target,
+            promotion=pieceTypeOf(move.promotion) if move.promotion else None,
+        )
+        snapshot = None
+        if board.ply % self.snapshot_interval == 0:
+            snapshot = (board.pack(), board.turn)
+
+        with self.lock:
+            self.pending.setdefault(match_id, []).append(entry)
+            if snapshot is not None:
+                self.snapshots[match_id] = snapshot
+            if self.interval > 0:
+                self.start_timer()
+
+    def flush(self, match_id: Union[int, None] = None):
+        with self.lock:
+            if match_id is None:
+                pending, self.pending = self.pending, {}
+                snapshots, self.snapshots = self.snapshots, {}
+            elif match_id in self.pending:
+                pending = {match_id: self.pending.pop(match_id)}
+                snapshots = {}
+                if match_id in self.snapshots:
+                    snapshots[match_id] = self.snapshots.pop(match_id)
+            else:
+                return
+
+        failure = None
+        for match_id, moves in pending.items():
+            snapshot = snapshots.get(match_id)
+            try:
+                try:
+                    write_moves(moves, {match_id: snapshot} if snapshot else {})
+                except IntegrityError:
+                    self.write_each(match_id, moves, snapshot)
+            except Exception as e:
+                with self.lock:  # retry with the next flush, keeping the move order
+                    self.pending[match_id] = moves + self.pending.get(match_id, [])
+                    if snapshot:
+                        self.snapshots.setdefault(match_id, snapshot)
+                failure = failure or e
+
+        if failure is not None:
+            raise failure
+
+    def write_each(
+        self,
+        match_id: int,
+        moves: List[MoveModel],
+        snapshot: Union[Tuple[bytes, str], None],
+    ):
+        # After an IntegrityError, writes the moves one by one, so that only those
+        # that can never be stored are lost, e.g. a ply another process logged too.
+        # Retrying them would block every later move of the room.
+        dropped = list()
+        for move in moves:
+            try:
+                write_moves([move], {})
+            except IntegrityError:
+                dropped.append(move)
+
+        if dropped:
+            # the snapshot would not match the log
+            logging.error(
+                "Dropping the moves %s of match %d.",
+                ", ".join(
+                    f"{move.ply}:{move.source}-{move.target}" for move in dropped
+                ),
+                match_id,
+            )
+        elif snapshot:
+            write_moves([], {match_id: snapshot})
+
+
+class Touches(TimedFlush):
+    # Buffers when matches were last accessed and writes the times of all matches
+    # with one UPDATE per interval, instead of saving the match on every access.
+
+    description = "match access times"
+
+    def __init__(self, interval: float):
+        super().__init__(max(interval, 1))
+        self.pending: Dict[int, datetime] = {}
+
+    def touch(self, match_id: int):
+        with self.lock:
+            self.pending[match_id] = timezone.now()
+            self.start_timer()
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+
+        if not pending:
+            return
+
+        try:
+            ChessMatchModel.objects.bulk_update(
+                [
+                    ChessMatchModel(id=match_id, last_accessed=last_accessed)
+                    for match_id, last_accessed in pending.items()
+                ],
+                ["last_accessed"],
+            )
+        except Exception:
+            with self.lock:  # newer touches take precedence
+                for match_id, last_accessed in pending.items():
+                    self.pending.setdefault(match_id, last_accessed)
+            raise
+
+
+write_behind = WriteBehind(
+    getattr(settings, "CHESS_PERSIST_INTERVAL", 0),
+    getattr(settings, "CHESS_SNAPSHOT_INTERVAL", 20),
+)
+touches = Touches(getattr(settings, "CHESS_TOUCH_INTERVAL", 30))
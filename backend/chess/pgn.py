@@ -0,0 +1,224 @@
+import bz2
+import gzip
+import re
+import sys
+from typing import Dict, Final, Iterable, Iterator, List, NamedTuple, Tuple
+
+from chess.game_logic import (
+    EMPTY,
+    FEN_PIECES,
+    KING,
+    PAWN,
+    START_FEN,
+    TYPE_MASK,
+    Board,
+    Move,
+    parseSquare,
+    squareName,
+)
+
+# Reading and writing of games in Portable Game Notation and of moves in Standard Algebraic
+# Notation (SAN), see https://www.chessprogramming.org/Portable_Game_Notation
+
+RESULTS: Final = ("1-0", "0-1", "1/2-1/2", "*")
+
+HEADER: Final = re.compile(r'^\[(\w+)\s+"(.*)"\]\s*$')
+MOVETEXT_TOKEN: Final = re.compile(r"\{[^}]*\}|;[^\n]*|\(|\)|\$\d+|[^\s(){};]+")
+MOVE_NUMBER: Final = re.compile(r"^\d+\.+")
+SAN: Final = re.compile(r"^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$")
+
+
+class PgnGame(NamedTuple):
+    headers: Dict[str, str]
+    moves: List[str]  # SAN of the main line
+    result: str
+
+
+def open_text(path: str):
+    # a PGN file for read_games, standard input for -. Compressed archives are read
+    # as they are decompressed, bytes that are not valid text are replaced.
+    if path == "-":
+        return sys.stdin
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", errors="replace")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rt", errors="replace")
+    return open(path, errors="replace")
+
+
+def read_games(lines: Iterable[str]) -> Iterator[PgnGame]:
+    # Yields the games of a PGN stream one by one, without reading it all at once.
+    # Comments, annotations and variations are skipped.
+    headers: Dict[str, str] = {}
+    movetext: List[str] = []
+
+    for line in lines:
+        line = line.strip()
+        if line.startswith("%"):  # escaped line
+            continue
+
+        header = HEADER.match(line)
+        if header:
+            if movetext:  # the headers of the next game
+                yield parse_game(headers, movetext)
+                headers, movetext = {}, []
+            headers[header.group(1)] = header.group(2)
+        elif line:
+            movetext.append(line)
+
+    if headers or movetext:
+        yield parse_game(headers, movetext)
+
+
+def parse_game(headers: Dict[str, str], movetext: List[str]) -> PgnGame:
+    moves = list()
+    result = headers.get("Result", "*")
+    depth = 0  # of nested variations
+
+    for token in MOVETEXT_TOKEN.findall("\n".join(movetext)):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth = max(depth - 1, 0)
+        elif depth or token[0] in "{;$":
+            continue
+        elif token in RESULTS:
+            result = token
+        else:
+            token = MOVE_NUMBER.sub("", token)
+            if token:
+                moves.append(token)
+
+    return PgnGame(headers, moves, result)
+
+
+def parse_san(board: Board, san: str) -> Move:
+    # The legal move of the board written as san. Raises ValueError for illegal,
+    # ambiguous or malformed moves.
+    text = san.rstrip("+#!?")
+    # only the moves matching the text are checked for legality, which is the
+    # expensive part
+    pseudo = board.generatePseudoMoves()
+
+    if text in ("O-O", "0-0", "O-O-O", "0-0-0"):
+        king = board.kingField(board.turn)
+        target = king + 2 if len(text) == 3 else king - 2
+        castling = [move for move in pseudo if move == Move(king, target)]
+        if not castling or not board.isLegal(castling[0]):
+            raise ValueError(f"Illegal castling {san}.")
+        return castling[0]
+
+    match = SAN.match(text)
+    if not match:
+        raise ValueError(f"Malformed move {san}.")
+
+    piece, file, rank, target, promotion = match.groups()
+    piece_type = FEN_PIECES.index(piece) + 1 if piece else PAWN
+    target = parseSquare(target)
+    promotion = FEN_PIECES.index(promotion) + 1 if promotion else 0
+
+    candidates = [
+        move
+        for move in pseudo
+        if move.target == target
+        and move.promotion == promotion
+        and board.squares[move.source] & TYPE_MASK == piece_type
+        and (file is None or move.source % 8 == ord(file) - ord("a"))
+        and (rank is None or 8 - move.source // 8 == int(rank))
+        # castling is only written as O-O
+        and not (piece_type == KING and abs(move.target - move.source) == 2)
+        and board.isLegal(move)
+    ]
+
+    if len(candidates) != 1:
+        raise ValueError(
+            f"{'Ambiguous' if candidates else 'Illegal'} move {san} in "
+            f"{board.toFen()}."
+        )
+    return candidates[0]
+
+
+def start_board(game: PgnGame) -> Board:
+    # games may start from the position of their FEN tag
+    return Board.fromFen(game.headers.get("FEN", START_FEN))
+
+
+def replay(game: PgnGame) -> Iterator[Tuple[Board, Move]]:
+    # Yields the board before every move of the game together with the move. The
+    # board is played on in place after each step. Raises ValueError at the first
+    # move that is not legal.
+    board = start_board(game)
+    for san in game.moves:
+        move = parse_san(board, san)
+        yield board, move
+        board.makeMove(move)
+
+
+def write_san(board: Board, move: Move) -> str:
+    # the SAN of a legal move of the board
+    squares = board.squares
+    piece_type = squares[move.source] & TYPE_MASK
+
+    if piece_type == KING and abs(move.target - move.source) == 2:
+        san = "O-O" if move.target > move.source else "O-O-O"
+    else:
+        capture = squares[move.target] != EMPTY or (
+            piece_type == PAWN and move.target == board.epSquare
+        )
+        if piece_type == PAWN:
+            san = squareName(move.source)[0] if capture else ""
+        else:
+            san = FEN_PIECES[piece_type - 1]
+            others = [
+                other.source
+                for other in board.generatePseudoMoves()
+                if other.target == move.target
+                and other.source != move.source
+                and squares[other.source] & TYPE_MASK == piece_type
+                and board.isLegal(other)
+            ]
+            if others:
+                name = squareName(move.source)
+                if all(pos % 8 != move.source % 8 for pos in others):
+                    san += name[0]
+                elif all(pos // 8 != move.source // 8 for pos in others):
+                    san += name[1]
+                else:
+                    san += name
+        san += ("x" if capture else "") + squareName(move.target)
+        if move.promotion:
+            san += "=" + FEN_PIECES[move.promotion - 1]
+
+    board.makeMove(move)
+    if board.isInCheck():
+        san += "+" if board.generateLegalMoves() else "#"
+    board.unmakeMove()
+    return san
+
+
+def write_game(
+    headers: Dict[str, str], moves: List[str], result: str, start_ply: int = 0
+) -> str:
+    # a game in PGN whose moves start at start_ply (see Board.ply), the movetext
+    # wrapped at 80 characters
+    lines = [f'[{tag} "{value}"]' for tag, value in headers.items()]
+    lines.append("")
+
+    tokens = list()
+    for ply, san in enumerate(moves, start_ply):
+        if ply % 2 == 0:
+            tokens.append(f"{ply // 2 + 1}.")
+        elif ply == start_ply:
+            tokens.append(f"{ply // 2 + 1}...")
+        tokens.append(san)
+    tokens.append(result)
+
+    line = ""
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > 80:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,58 @@
+import struct
+from typing import Final
+
+from chess.game_logic import EMPTY, PIECE_CODES, PROMOTIONS, Board, pieceTypeOf
+from chess.models import ChessPieceColor
+
+# Compact binary encoding of the websocket messages. Clients opt in by requesting
+# the subprotocol when connecting, everybody else keeps talking JSON. Every frame
+# starts with the message kind.
+
+BINARY_SUBPROTOCOL: Final = "chess.binary.v1"
+
+STATE: Final = 0
+INTERACTION: Final = 1
+
+# kind, piece codes of the 64 fields as in Board.squares, turn, seq
+STATE_FRAME: Final = struct.Struct(">B64sBI")
+# kind, source, target, promotion piece code, color, seq
+INTERACTION_FRAME: Final = struct.Struct(">BBBBBI")
+# kind, source, target, promotion piece code, sent by clients
+CLIENT_INTERACTION_FRAME: Final = struct.Struct(">BBBB")
+
+COLORS: Final = (ChessPieceColor.WHITE, ChessPieceColor.BLACK)
+
+
+def encode_state(board: Board, seq: int) -> bytes:
+    return STATE_FRAME.pack(STATE, bytes(board.squares), COLORS.index(board.turn), seq)
+
+
+def encode_interaction(data: dict, seq: int) -> bytes:
+    return INTERACTION_FRAME.pack(
+        INTERACTION,
+        data["source"],
+        data["target"],
+        PIECE_CODES.get(data.get("promotion"), EMPTY),
+        COLORS.index(data["color"]),
+        seq,
+    )
+
+
+def decode_message(frame: bytes) -> dict:
+    # a client frame as the message its JSON counterpart would be parsed to
+    if len(frame) != CLIENT_INTERACTION_FRAME.size or frame[0] != INTERACTION:
+        raise ValueError("Unknown chess message.")
+
+    kind, source, target, promotion = CLIENT_INTERACTION_FRAME.unpack(frame)
+    if (
+        source > 63
+        or target > 63
+        or (promotion != EMPTY and promotion not in PROMOTIONS)
+    ):
+        raise ValueError("Invalid chess interaction.")
+
+    data = {"source": source, "target": target}
+    if promotion != EMPTY:
+        data["promotion"] = pieceTypeOf(promotion)
+
+    return {"type": "interaction", "data": data}
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from typing import List, Union
+
+from django.db import transaction
+from django.utils import timezone
+
+from chess.game_logic import Board, START_FEN
+from chess.lobby import invalidate_lobby
+from chess.models import ChessMatchModel
+
+START_POSITION = Board.fromFen(START_FEN).pack()
+
+
+def create_match(match_id: int, engine=None) -> ChessMatchModel:
+    # Creates a match in the starting position with a single INSERT. Raises
+    # IntegrityError if the match has been created concurrently.
+    chess_match = ChessMatchModel.objects.create(
+        id=match_id, position=START_POSITION, engine=engine
+    )
+    invalidate_lobby()
+    return chess_match
+
+
+def provision_matches(match_ids: List[int], batch_size: int = 500) -> int:
+    # Pre-creates pooled matches for the ids that are still free, e.g. the rooms of an
+    # upcoming tournament, so that opening them later is a single UPDATE.
+    created = 0
+
+    for i in range(0, len(match_ids), batch_size):
+        batch = match_ids[i : i + batch_size]
+
+        with transaction.atomic():
+            existing = set(
+                ChessMatchModel.objects.filter(id__in=batch).values_list(
+                    "id", flat=True
+                )
+            )
+            new_ids = [match_id for match_id in batch if match_id not in existing]
+            ChessMatchModel.objects.bulk_create(
+                ChessMatchModel(id=match_id, pooled=True, position=START_POSITION)
+                for match_id in new_ids
+            )
+
+        created += len(new_ids)
+
+    return created
+
+
+def claim_pooled_match(match_id: int, engine=None) -> Union[ChessMatchModel, None]:
+    # Atomically takes a match out of the pool. Only one caller can win the claim.
+    claimed = ChessMatchModel.objects.filter(id=match_id, pooled=True).update(
+        pooled=False, last_accessed=timezone.now(), engine=engine
+    )
+    if not claimed:
+        return None
+
+    invalidate_lobby()
+    return ChessMatchModel.objects.get(id=match_id)
+
+
+def reap_stale_matches(max_idle: timedelta, batch_size: int = 500) -> int:
+    # Deletes the matches nobody accessed within max_idle together with their pieces
+    # and moves. Every batch is its own transaction, so the tables are never locked
+    # for long. Pooled matches are kept, they are waiting for their players, and so are
+    # archived ones.
+    cutoff = timezone.now() - max_idle
+    deleted = 0
+
+    while True:
+        with transaction.atomic():
+            batch = list(
+                ChessMatchModel.objects.filter(
+                    pooled=False, archived=False, last_accessed__lt=cutoff
+                )
+                .order_by("last_accessed")
+                .values_list("id", flat=True)[:batch_size]
+            )
+            if not batch:
+                break
+
+            # the pieces and moves are deleted by the cascade
+            ChessMatchModel.objects.filter(id__in=batch).delete()
+
+        deleted += len(batch)
+
+    if deleted:
+        invalidate_lobby()
+    return deleted
@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Iterable, List, Set, Tuple, Union
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from chess.fanout import Fanout
+from chess.game_logic import Board, EMPTY, Move, pieceTypeOf
+from chess.models import ChessPieceColor
+from chess.persistence import touches, write_behind
+
+
+class Room:
+    # The authoritative board of a match in this process, shared by all its connections.
+
+    def __init__(self, match_id: int, board: Board):
+        self.match_id = match_id
+        self.board = board
+        self.connections = 0
+        self.last_used = time.monotonic()
+        # ids of recently applied moves, moves made in this process come back from the
+        # channel layer but must only be applied to the board once
+        self.applied = deque(maxlen=64)
+        # (seq, data) of the recent interactions for clients resuming after a reconnect
+        self.recent = deque(maxlen=getattr(settings, "CHESS_ROOM_REPLAY_SIZE", 128))
+        self.fanout = Fanout(self)
+        # session keys of the players, see set_seats
+        self.white: Union[str, None] = None
+        self.black: Union[str, None] = None
+        # the color played by the engine, if any, and whether it is searching a move
+        self.engine = None
+        self.thinking = False
+        # the running engine moves, see ChessConsumer.start_engine
+        self.engine_tasks: Set[asyncio.Task] = set()
+        self.lock = threading.Lock()
+
+    @property
+    def seq(self) -> int:
+        # sequence number of the latest move, the ply of the board
+        return self.board.ply
+
+    def set_seats(self, white: Union[str, None], black: Union[str, None]):
+        # from the match when the room is joined and from seats_message when a seat
+        # is claimed
+        self.white = white
+        self.black = black
+
+    def seat(self, session_key: Union[str, None]):
+        if session_key is None:
+            return None
+        if session_key == self.white:
+            return ChessPieceColor.WHITE
+        if session_key == self.black:
+            return ChessPieceColor.BLACK
+        return None
+
+    def interact(
+        self, source: int, target: int, move_id: str, promotion: int = EMPTY
+    ) -> Union[Move, None]:
+        with self.lock:
+            piece = self.board.getPiece(source)
+            if piece is None or not piece.interact(target, promotion):
+                return None
+
+            self.applied.append(move_id)
+            return self.board.lastMove()
+
+    def play(self, move: Move, move_id: str) -> bool:
+        # a move given as the board's Move, e.g. from the engine
+        with self.lock:
+            if move not in self.board.generateLegalMoves():
+                return False
+
+            self.board.makeMove(move)
+            self.applied.append(move_id)
+            return True
+
+    def apply(self, move_id: str, move: Iterable[int], seq: int) -> bool:
+        # Replays a move that was validated by the room of another process. Moves
+        # that do not follow the current position, made concurrently elsewhere, are
+        # ignored.
+        with self.lock:
+            if move_id in self.applied or seq != self.seq + 1:
+                return False
+
+            move, board = Move(*move), self.board
+            # a process whose board went astray must not corrupt this one
+            if move not in board.generatePseudoMoves() or not board.isLegal(move):
+                return False
+
+            board.makeMove(move)
+            self.applied.append(move_id)
+            return True
+
+    async def announce(self, move_id: str, move: Move, data: dict):
+        # Shares a move made on this room's board with its sockets, the database and
+        # the rooms of other processes. Called right after the move.
+        seq = self.seq
+        if move.promotion:
+            data["promotion"] = pieceTypeOf(move.promotion)
+        self.remember(seq, data)
+        self.fanout.publish(seq, data)
+        touches.touch(self.match_id)
+
+        write_behind.record(self.match_id, self.board)
+        if write_behind.interval <= 0:
+            try:
+                await database_sync_to_async(write_behind.flush)(self.match_id)
+            except Exception:
+                # the moves stay queued for the room's next flush, the other
+                # processes must learn about the move regardless
+                logging.exception("Writing the moves of room %s failed.", self.match_id)
+
+        await self.fanout.group_send(
+            {
+                "type": "interaction",
+                "data": data,
+                "seq": seq,
+                # lets the rooms of other processes follow the move
+                "id": move_id,
+                "move": move,
+            },
+        )
+
+    def remember(self, seq: int, data: dict):
+        with self.lock:
+            self.recent.append((seq, data))
+
+    def missed(self, last_seq: int) -> Union[List[Tuple[int, dict]], None]:
+        # The interactions after last_seq, or None if they are not all buffered and
+        # the client needs the whole position.
+        with self.lock:
+            if last_seq == self.seq:
+                return []
+            if (
+                last_seq > self.seq
+                or not self.recent
+                or self.recent[0][0] > last_seq + 1
+            ):
+                return None
+            return [(seq, data) for seq, data in self.recent if seq > last_seq]
+
+
+class RoomRegistry:
+    # Process wide cache of rooms. Rooms are reference counted by their connections
+    # and only evicted once nobody is connected, either because they have been idle
+    # for longer than idle_timeout seconds or to stay within max_rooms, least recently
+    # used first.
+
+    def __init__(self, max_rooms: int, idle_timeout: float):
+        self.max_rooms = max_rooms
+        self.idle_timeout = idle_timeout
+        self.rooms: "OrderedDict[int, Room]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def acquire(self, match_id: int, load: Callable[[], Board]) -> Room:
+        with self.lock:
+            room = self.rooms.get(match_id)
+
+            if room is None:
+                room = Room(match_id, load())
+                self.rooms[match_id] = room
+
+            self.rooms.move_to_end(match_id)
+            room.connections += 1
+            room.last_used = time.monotonic()
+
+        self.evict()
+        return room
+
+    def release(self, room: Room):
+        with self.lock:
+            room.connections -= 1
+            room.last_used = time.monotonic()
+            if room.match_id in self.rooms:
+                self.rooms.move_to_end(room.match_id)
+
+        self.evict()
+
+    def get(self, match_id: int):
+        return self.rooms.get(match_id)
+
+    def evict(self):
+        # writes the pending moves of evicted rooms, call it off the event loop
+        now = time.monotonic()
+        evicted = list()
+
+        with self.lock:
+            overflow = len(self.rooms) - self.max_rooms
+
+            # oldest first, so the first idle room that is recent enough ends the scan
+            for match_id, room in list(self.rooms.items()):
+                if room.connections > 0:
+                    continue
+
+                if overflow <= 0 and now - room.last_used <= self.idle_timeout:
+                    break
+
+                del self.rooms[match_id]
+                evicted.append((match_id, room))
+                overflow -= 1
+
+        # a room loaded again later must see the moves that are still pending
+        for match_id, room in evicted:
+            room.fanout.close()
+            try:
+                write_behind.flush(match_id)
+            except Exception:  # requeued, the next flush of all rooms writes them
+                logging.exception("Writing the moves of room %s failed.", match_id)
+
+
+rooms = RoomRegistry(
+    getattr(settings, "CHESS_ROOM_CACHE_SIZE", 1000),
+    getattr(settings, "CHESS_ROOM_IDLE_TIMEOUT", 300),
+)
@@ -1,31 +1,12 @@
 from rest_framework import serializers
-from chess.models import ChessMatchModel, ChessPieceModel
+from chess.game_logic import START_FEN, Board
+from chess.models import ChessMatchModel, ChessPieceColor
 
-
-class PieceSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = ChessPieceModel
-        fields = ["pos", "type", "color"]
-
-
-class ChessMatchSerializer(serializers.ModelSerializer):
-    pieces = PieceSerializer(many=True)
-
-    class Meta:
-        model = ChessMatchModel
-        fields = [
-            "id",
-            "last_accessed",
-            "pieces",
-            "turn",
-        ]
-
-    def create(self, validated_data) -> ChessMatchModel:
-        pieces_data = validated_data.pop("pieces")
-        chess_match = ChessMatchModel.objects.create(**validated_data)
-        for piece_data in pieces_data:
-            ChessPieceModel.objects.create(chess_match=chess_match, **piece_data)
-        return chess_match
+# limits of one request to the move validation endpoint
+MAX_VALIDATED_PLIES = 1000
+MAX_VALIDATED_GAMES = 1000
+# of all games of a batch together
+MAX_VALIDATED_BATCH_PLIES = 20000
 
 
 class ChessMatchInfoSerializer(serializers.ModelSerializer):
@@ -41,7 +22,37 @@ class ChessMatchInfoSerializer(serializers.ModelSerializer):
         ]
 
     def is_white_assigned(self, obj: ChessMatchModel) -> bool:
-        return obj.white is not None
+        return obj.white is not None or obj.engine == ChessPieceColor.WHITE
 
     def is_black_assigned(self, obj: ChessMatchModel) -> bool:
-        return obj.black is not None
+        return obj.black is not None or obj.engine == ChessPieceColor.BLACK
+
+
+class MoveSequenceSerializer(serializers.Serializer):
+    # a line of moves in UCI notation from a position, the starting one by default
+    fen = serializers.CharField(required=False, default=START_FEN)
+    moves = serializers.ListField(
+        child=serializers.CharField(max_length=5), max_length=MAX_VALIDATED_PLIES
+    )
+
+    def validate_fen(self, fen: str) -> str:
+        # positions that cannot occur in a game are rejected too, move generation
+        # relies on not seeing them
+        try:
+            Board.fromFen(fen)
+        except ValueError as e:
+            raise serializers.ValidationError(str(e))
+        return fen
+
+
+class MoveBatchSerializer(serializers.Serializer):
+    games = serializers.ListField(
+        child=MoveSequenceSerializer(), max_length=MAX_VALIDATED_GAMES
+    )
+
+    def validate_games(self, games: list) -> list:
+        if sum(len(game["moves"]) for game in games) > MAX_VALIDATED_BATCH_PLIES:
+            raise serializers.ValidationError(
+                f"At most {MAX_VALIDATED_BATCH_PLIES} moves can be validated at once."
+            )
+        return games
@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/4.1/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
+
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -133,9 +134,51 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 100,
 }
 
+# Games against the computer: worker processes searching engine moves (default one
+# per core), the search depth and the time limit per move in seconds
+CHESS_ENGINE_WORKERS = int(os.getenv("CHESS_ENGINE_WORKERS", 0))
+CHESS_ENGINE_DEPTH = int(os.getenv("CHESS_ENGINE_DEPTH", 5))
+CHESS_ENGINE_TIME_LIMIT = float(os.getenv("CHESS_ENGINE_TIME_LIMIT", 2))
+
+# Opening book built by the buildbook command, the engine plays from it while the
+# position is in the book
+CHESS_OPENING_BOOK = os.getenv("CHESS_OPENING_BOOK", str(BASE_DIR / "opening.book"))
+
+# Directory of the endgame tables built by the buildtablebases command, positions
+# they cover are looked up instead of searched
+CHESS_TABLEBASE_DIR = os.getenv("CHESS_TABLEBASE_DIR", str(BASE_DIR / "tablebases"))
+
+# Seconds the first page of the room listing is cached for
+CHESS_LOBBY_CACHE_TTL = float(os.getenv("CHESS_LOBBY_CACHE_TTL", 5))
+
 # Daphne
 ASGI_APPLICATION = "chess.asgi.application"
 
+# Seconds between batched writes of moves to the database, 0 writes every move at once
+CHESS_PERSIST_INTERVAL = float(os.getenv("CHESS_PERSIST_INTERVAL", 0))
+
+# Moves are logged one by one, the position itself is only stored every this many
+# plies and completed by replaying the logged moves when a board is loaded
+CHESS_SNAPSHOT_INTERVAL = int(os.getenv("CHESS_SNAPSHOT_INTERVAL", 20))
+
+# Seconds between the batched updates of when matches were last accessed, at least 1
+CHESS_TOUCH_INTERVAL = float(os.getenv("CHESS_TOUCH_INTERVAL", 30))
+
+# Matches not accessed for this many seconds are deleted by the reapmatches command
+CHESS_MATCH_TTL = float(os.getenv("CHESS_MATCH_TTL", 30 * 24 * 60 * 60))
+
+# Boards of rooms nobody is connected to are kept in memory for reconnects,
+# up to this many rooms and for this many seconds
+CHESS_ROOM_CACHE_SIZE = int(os.getenv("CHESS_ROOM_CACHE_SIZE", 1000))
+CHESS_ROOM_IDLE_TIMEOUT = float(os.getenv("CHESS_ROOM_IDLE_TIMEOUT", 300))
+
+# Recent moves kept per room, clients reconnecting with a last_seq within this many
+# moves are only sent the moves they missed instead of the whole position
+CHESS_ROOM_REPLAY_SIZE = int(os.getenv("CHESS_ROOM_REPLAY_SIZE", 128))
+
+# Sockets falling this many moves behind are sent the current position instead
+CHESS_FANOUT_BACKLOG = int(os.getenv("CHESS_FANOUT_BACKLOG", 32))
+
 CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels_redis.core.RedisChannelLayer",
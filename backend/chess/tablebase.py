@@ -0,0 +1,535 @@
+import mmap
+import os
+import re
+from array import array
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from typing import Dict, Final, List, NamedTuple, Tuple, Union
+
+import django
+from django.conf import settings
+
+from chess.game_logic import (
+    BLACK,
+    EMPTY,
+    FEN_PIECES,
+    KING,
+    PAWN,
+    TYPE_MASK,
+    Board,
+)
+from chess.models import ChessPieceColor
+
+# Endgame tablebases: the exact outcome and distance to mate of every position with a
+# few pieces, computed by retrograde analysis. A table covers one material, named by
+# the pieces of white and then black, e.g. KQK or KRKP. Positions of the other color
+# are looked up with the colors swapped.
+#
+# A table file holds one signed byte per position from the view of the side to move:
+# 0 for draws, n > 0 for a win with mate in n plies and -n - 1 for a loss with mate in
+# n plies. The files are mapped into memory when probed. Castling rights and en
+# passant are not part of the tables, such positions are not probed.
+
+WIN: Final = 1
+DRAW: Final = 0
+LOSS: Final = -1
+
+MAX_PIECES: Final = 4
+MAX_PLIES: Final = 126
+# order of the pieces of a side in a material name
+PIECE_ORDER: Final = "KQRBNP"
+DEFAULT_MATERIALS: Final = ("KQK", "KRK", "KPK")
+MATERIAL: Final = re.compile(r"^K[QRBNP]*K[QRBNP]*$")
+
+
+class Probe(NamedTuple):
+    wdl: int  # WIN, DRAW or LOSS for the side to move
+    plies: Union[int, None]  # until mate, None for draws
+
+
+def decode(value: int) -> Probe:
+    if value > 0:
+        return Probe(WIN, value)
+    if value < 0:
+        return Probe(LOSS, -value - 1)
+    return Probe(DRAW, None)
+
+
+# Symmetry: the white king is moved into the a1-d1-d4 triangle by mirroring and
+# flipping the board, with pawns only into the files a to d, so a table stores 10
+# (or 32) instead of 64 king fields.
+
+
+def mirror_file(pos: int) -> int:
+    return pos ^ 7
+
+
+def mirror_rank(pos: int) -> int:
+    return pos ^ 56
+
+
+def flip_diagonal(pos: int) -> int:
+    # along a1-h8, swapping files and ranks
+    file, rank = pos % 8, 7 - pos // 8
+    return (7 - file) * 8 + rank
+
+
+def canonical_transform(king: int, pawns: bool) -> bytes:
+    # the fields all pieces are moved to, for the white king on king
+    transform = list(range(64))
+    file, rank = king % 8, 7 - king // 8
+    if file > 3:
+        transform = [mirror_file(pos) for pos in transform]
+        file = 7 - file
+    if not pawns:
+        if rank > 3:
+            transform = [mirror_rank(pos) for pos in transform]
+            rank = 7 - rank
+        if rank > file:
+            transform = [flip_diagonal(pos) for pos in transform]
+    return bytes(transform)
+
+
+# TRANSFORMS[pawns][king]
+TRANSFORMS: Final = tuple(
+    tuple(canonical_transform(king, pawns) for king in range(64))
+    for pawns in (False, True)
+)
+# KING_FIELDS[pawns], the fields the white king can have in a table
+KING_FIELDS: Final = tuple(
+    sorted({TRANSFORMS[pawns][king][king] for king in range(64)})
+    for pawns in (False, True)
+)
+KING_SLOTS: Final = tuple(
+    {pos: slot for slot, pos in enumerate(fields)} for fields in KING_FIELDS
+)
+
+
+def side_material(board: Board, color: int) -> str:
+    pieces = [
+        FEN_PIECES[(code & TYPE_MASK) - 1]
+        for code in board.squares
+        if code and code & BLACK == color
+    ]
+    return "".join(sorted(pieces, key=PIECE_ORDER.index))
+
+
+def normalized(name: str) -> str:
+    # the name of a material with the pieces of each side in PIECE_ORDER
+    white, black = split_material(name)
+    return "".join(
+        "".join(sorted(side, key=PIECE_ORDER.index)) for side in (white, black)
+    )
+
+
+def split_material(name: str) -> Tuple[str, str]:
+    second = name.index("K", 1)
+    return name[:second], name[second:]
+
+
+def is_drawn_material(white: str, black: str) -> bool:
+    # bare kings, or a king and a single minor piece against a bare king
+    return sorted((white, black)) in (["K", "K"], ["K", "KB"], ["K", "KN"])
+
+
+def piece_codes(name: str) -> Tuple[int, ...]:
+    # the piece codes of a table in index order, the white king first
+    white, black = split_material(name)
+    return tuple(FEN_PIECES.index(piece) + 1 for piece in white) + tuple(
+        (FEN_PIECES.index(piece) + 1) | BLACK for piece in black
+    )
+
+
+class Layout:
+    # how the positions of one material are numbered
+
+    def __init__(self, name: str):
+        self.name = name
+        self.codes = piece_codes(name)
+        self.pawns = any(code & TYPE_MASK == PAWN for code in self.codes)
+        self.king_fields = KING_FIELDS[self.pawns]
+        self.size = len(self.king_fields) * 64 ** (len(self.codes) - 1) * 2
+
+    def index(self, pieces: List[Tuple[int, int]], black_to_move: bool) -> int:
+        # pieces are (code, pos) pairs of exactly the codes of the layout
+        positions = defaultdict(list)
+        for code, pos in pieces:
+            positions[code].append(pos)
+
+        transform = TRANSFORMS[self.pawns][positions[KING][0]]
+        for code in positions:
+            positions[code] = sorted(transform[pos] for pos in positions[code])
+
+        index = 0
+        for code in self.codes:
+            pos = positions[code].pop(0)
+            if code == KING:
+                index = KING_SLOTS[self.pawns][pos]
+            else:
+                index = index * 64 + pos
+        return index * 2 + black_to_move
+
+    def pieces(self, index: int) -> Tuple[List[Tuple[int, int]], bool]:
+        black_to_move = bool(index & 1)
+        index >>= 1
+        fields = list()
+        for code in reversed(self.codes[1:]):
+            fields.append(index % 64)
+            index //= 64
+        fields.append(self.king_fields[index])
+        return list(zip(self.codes, reversed(fields))), black_to_move
+
+
+class Table:
+    def __init__(self, path: str, name: str):
+        self.layout = Layout(name)
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size != self.layout.size:
+                raise ValueError(f"{path} is not a {name} table.")
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def value(self, index: int) -> int:
+        value = self.data[index]
+        return value - 256 if value > 127 else value
+
+
+class Tablebases:
+    # the tables in a directory, opened when first probed
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.tables: Dict[str, Union[Table, None]] = {}
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.tb")
+
+    def table(self, name: str) -> Union[Table, None]:
+        if name not in self.tables:
+            path = self.path(name)
+            self.tables[name] = Table(path, name) if os.path.exists(path) else None
+        return self.tables[name]
+
+    def probe(self, board: Board) -> Union[Probe, None]:
+        # the outcome of the position with perfect play, None if it is not covered
+        if board.castling or board.epSquare is not None:
+            return None
+        if len(board.squares) - board.squares.count(EMPTY) > MAX_PIECES:
+            return None
+
+        white, black = side_material(board, 0), side_material(board, BLACK)
+        if is_drawn_material(white, black):
+            return Probe(DRAW, None)
+
+        swapped = False
+        table = self.table(white + black)
+        if table is None:
+            swapped = True
+            table = self.table(black + white)
+            if table is None:
+                return None
+
+        pieces = [
+            (code ^ BLACK, pos ^ 56) if swapped else (code, pos)
+            for pos, code in enumerate(board.squares)
+            if code
+        ]
+        black_to_move = (board.turn == ChessPieceColor.BLACK) != swapped
+        return decode(table.value(table.layout.index(pieces, black_to_move)))
+
+    def best_move(self, board: Board):
+        # the move keeping the best outcome, mating fastest or losing slowest, None
+        # if the position is not covered or the game is over
+        best, best_rank = None, None
+        for move in board.generateLegalMoves():
+            board.makeMove(move)
+            probe = self.probe(board)
+            board.unmakeMove()
+            if probe is None:
+                return None
+
+            # the probe is from the opponent's view
+            if probe.wdl == LOSS:
+                rank = (2, -probe.plies)
+            elif probe.wdl == DRAW:
+                rank = (1, 0)
+            else:
+                rank = (0, probe.plies)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = move, rank
+        return best
+
+
+_tablebases: Union[Tablebases, None] = None
+
+
+def tablebases() -> Union[Tablebases, None]:
+    # the tables of the CHESS_TABLEBASE_DIR setting, None if there are none
+    global _tablebases
+    directory = getattr(settings, "CHESS_TABLEBASE_DIR", None)
+    if not directory or not os.path.isdir(directory):
+        return None
+    if _tablebases is None or _tablebases.directory != directory:
+        _tablebases = Tablebases(directory)
+    return _tablebases
+
+
+# Generation. Workers scan ranges of positions with the game_logic move rules. For
+# every position they record the positions of the same table that its moves lead to,
+# and the outcomes of its captures and promotions, which leave the table and are
+# probed in the smaller tables built before. The outcomes are then spread backwards
+# from the mates ply by ply: a position is won one ply after one of its moves reaches
+# a lost position, and lost one ply after the last of its moves reaches a won one.
+
+# status flags of a position, positions without any are not part of the table
+PLAYABLE: Final = 1
+MATED: Final = 2
+STALEMATE: Final = 4
+# a capture or promotion of the position leads to a draw
+DRAWING_EXIT: Final = 8
+
+
+class Scan(NamedTuple):
+    start: int
+    status: bytes
+    successors: array  # of all positions of the range, one after another
+    counts: bytes  # successors per position
+    exit_wins: bytes  # plies of the fastest win by leaving the table, 0 for none
+    exit_losses: bytes  # plies of the slowest loss by leaving the table, 0 for none
+
+
+def scan_range(name: str, directory: str, start: int, stop: int) -> Scan:
+    layout = Layout(name)
+    smaller = Tablebases(directory)
+    status = bytearray(stop - start)
+    counts = bytearray(stop - start)
+    exit_wins = bytearray(stop - start)
+    exit_losses = bytearray(stop - start)
+    successors = array("I")
+
+    for offset, index in enumerate(range(start, stop)):
+        pieces, black_to_move = layout.pieces(index)
+        board = place_pieces(layout, pieces, black_to_move)
+        if board is None:
+            continue
+
+        moves = board.generateLegalMoves()
+        if not moves:
+            status[offset] = MATED if board.isInCheck() else STALEMATE
+            continue
+
+        status[offset] = PLAYABLE
+        squares = board.squares
+        for move in moves:
+            if squares[move.target] != EMPTY or move.promotion:
+                board.makeMove(move)
+                probe = smaller.probe(board)
+                board.unmakeMove()
+                if probe is None:
+                    raise ValueError(f"{name} needs the table of {board.toFen()}.")
+                if probe.wdl == LOSS:
+                    plies = probe.plies + 1
+                    if not exit_wins[offset] or plies < exit_wins[offset]:
+                        exit_wins[offset] = plies
+                elif probe.wdl == WIN:
+                    exit_losses[offset] = max(exit_losses[offset], probe.plies + 1)
+                else:
+                    status[offset] |= DRAWING_EXIT
+                continue
+
+            moved = [
+                (code, move.target if pos == move.source else pos)
+                for code, pos in pieces
+            ]
+            successors.append(layout.index(moved, not black_to_move))
+            counts[offset] += 1
+
+    return Scan(
+        start,
+        bytes(status),
+        successors,
+        bytes(counts),
+        bytes(exit_wins),
+        bytes(exit_losses),
+    )
+
+
+def place_pieces(
+    layout: Layout, pieces: List[Tuple[int, int]], black_to_move: bool
+) -> Union[Board, None]:
+    # the board of the pieces, None if they do not form a position of the table
+    fields = [pos for code, pos in pieces]
+    if len(set(fields)) != len(fields):
+        return None
+    for (code, pos), (next_code, next_pos) in zip(pieces, pieces[1:]):
+        if code == next_code and pos > next_pos:
+            return None  # identical pieces are stored in one order only
+    if any(code & TYPE_MASK == PAWN and (pos < 8 or pos >= 56) for code, pos in pieces):
+        return None
+
+    board = Board()
+    for code, pos in pieces:
+        board.setField(pos, code)
+    if black_to_move:
+        board.turn = ChessPieceColor.BLACK
+    if board.isInCheck(
+        ChessPieceColor.WHITE if black_to_move else ChessPieceColor.BLACK
+    ):
+        return None  # the side that just moved cannot be in check
+    return board
+
+
+def solve(layout: Layout, scans: List[Scan]) -> array:
+    # the table values from the scans of all positions
+    size = layout.size
+    status = bytearray(size)
+    remaining = bytearray(size)
+    exit_wins = bytearray(size)
+    exit_losses = bytearray(size)
+    for scan in scans:
+        end = scan.start + len(scan.status)
+        status[scan.start : end] = scan.status
+        remaining[scan.start : end] = scan.counts
+        exit_wins[scan.start : end] = scan.exit_wins
+        exit_losses[scan.start : end] = scan.exit_losses
+
+    # predecessors of every position, as offsets into one array
+    offsets = array("I", bytes(4 * (size + 1)))
+    for scan in scans:
+        for successor in scan.successors:
+            offsets[successor + 1] += 1
+    for index in range(size):
+        offsets[index + 1] += offsets[index]
+    predecessors = array("I", bytes(4 * offsets[size]))
+    filled = array("I", offsets[:size])
+    for scan in scans:
+        position = 0
+        for offset, count in enumerate(scan.counts):
+            for successor in scan.successors[position : position + count]:
+                predecessors[filled[successor]] = scan.start + offset
+                filled[successor] += 1
+            position += count
+
+    values = array("b", bytes(size))
+    resolved = bytearray(size)
+    # candidates per ply, positions already resolved at a lower ply are skipped
+    pending: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    for index in range(size):
+        if status[index] == MATED:
+            pending[0].append((index, LOSS))
+        elif status[index] & PLAYABLE:
+            if exit_wins[index]:
+                pending[exit_wins[index]].append((index, WIN))
+            elif not remaining[index] and not status[index] & DRAWING_EXIT:
+                pending[exit_losses[index]].append((index, LOSS))
+
+    plies = 0
+    while pending:
+        frontier = list()
+        for index, outcome in pending.pop(plies, ()):
+            if resolved[index]:
+                continue
+            if plies > MAX_PLIES:
+                raise ValueError(f"{layout.name} has mates beyond {MAX_PLIES} plies.")
+            resolved[index] = 1
+            values[index] = plies if outcome == WIN else -plies - 1
+            frontier.append(index)
+
+        for index in frontier:
+            lost = values[index] < 0
+            for predecessor in predecessors[offsets[index] : offsets[index + 1]]:
+                if resolved[predecessor]:
+                    continue
+                if lost:
+                    pending[plies + 1].append((predecessor, WIN))
+                    continue
+                remaining[predecessor] -= 1
+                if (
+                    not remaining[predecessor]
+                    and not exit_wins[predecessor]
+                    and not status[predecessor] & DRAWING_EXIT
+                ):
+                    pending[max(plies + 1, exit_losses[predecessor])].append(
+                        (predecessor, LOSS)
+                    )
+        plies += 1
+
+    return values
+
+
+def dependencies(name: str) -> List[str]:
+    # the materials reached by a capture or a promotion, without the drawn ones
+    white, black = split_material(name)
+    reached = set()
+    for side, other, is_white in ((white, black, True), (black, white, False)):
+        for i, piece in enumerate(side):
+            if piece == "K":
+                continue
+            rest = side[:i] + side[i + 1 :]
+            changed = [rest]
+            if piece == "P":
+                changed += [rest + promoted for promoted in "QRBN"]
+            for new in changed:
+                reached.add(normalized(new + other if is_white else other + new))
+
+    return sorted(
+        canonical_name(material)
+        for material in reached
+        if not is_drawn_material(*split_material(material))
+    )
+
+
+def generation_order(names: List[str]) -> List[str]:
+    # the tables to build for names, each after the tables its positions lead to
+    order: List[str] = []
+
+    def visit(name: str):
+        if name in order:
+            return
+        for dependency in dependencies(name):
+            visit(dependency)
+        order.append(name)
+
+    for name in names:
+        visit(canonical_name(name))
+    return order
+
+
+def strength(side: str) -> tuple:
+    return len(side), [-PIECE_ORDER.index(piece) for piece in side]
+
+
+def canonical_name(name: str) -> str:
+    # tables are stored with the stronger side as white
+    if not MATERIAL.match(name):
+        raise ValueError(f"Invalid material {name}.")
+    white, black = split_material(normalized(name))
+    return black + white if strength(black) > strength(white) else white + black
+
+
+def generate(
+    name: str,
+    directory: str,
+    workers: Union[int, None] = None,
+    chunk_size: int = 4096,
+) -> str:
+    # Builds the table of one material, whose smaller tables must exist, scanning
+    # ranges of positions in parallel. Returns the path of the table.
+    layout = Layout(name)
+    if len(layout.codes) > MAX_PIECES:
+        raise ValueError(f"Tables have at most {MAX_PIECES} pieces.")
+
+    starts = range(0, layout.size, chunk_size)
+    stops = [min(start + chunk_size, layout.size) for start in starts]
+    with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+        scans = list(
+            pool.map(scan_range, repeat(name), repeat(directory), starts, stops)
+        )
+
+    values = solve(layout, scans)
+    path = Tablebases(directory).path(name)
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(values.tobytes())
+    os.replace(temporary, path)
+    return path
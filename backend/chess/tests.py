@@ -0,0 +1,317 @@
+from collections import deque
+
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIRequestFactory
+
+from chess.game_logic import KING, QUEEN, START_FEN, Board, Move
+from chess.models import ChessMatchModel, ChessPieceColor, ChessPieceType, MoveModel
+from chess.persistence import WriteBehind, load_board
+from chess.provisioning import create_match
+from chess.rooms import Room
+from chess.serializers import MAX_VALIDATED_BATCH_PLIES
+from chess.views import (
+    ChessMatchDetail,
+    ChessMatchList,
+    MoveValidation,
+    seats_claimed,
+)
+from chess.management.commands.checkqueryplans import FULL_SCAN, query_plans
+from chess.management.commands.perft import PERFT_POSITIONS
+from chess.protocol import (
+    INTERACTION,
+    INTERACTION_FRAME,
+    STATE,
+    STATE_FRAME,
+    decode_message,
+    encode_interaction,
+    encode_state,
+)
+
+
+class BinaryProtocolTests(SimpleTestCase):
+    def test_decodes_normal_move(self):
+        # e7e5
+        self.assertEqual(
+            decode_message(bytes([INTERACTION, 12, 28, 0])),
+            {"type": "interaction", "data": {"source": 12, "target": 28}},
+        )
+
+    def test_decodes_promotion(self):
+        self.assertEqual(
+            decode_message(bytes([INTERACTION, 8, 0, QUEEN])),
+            {
+                "type": "interaction",
+                "data": {"source": 8, "target": 0, "promotion": ChessPieceType.QUEEN},
+            },
+        )
+
+    def test_rejects_malformed_frames(self):
+        for frame in (
+            b"",
+            bytes([INTERACTION, 12, 28]),
+            bytes([INTERACTION, 12, 28, 0, 0]),
+            bytes([STATE, 12, 28, 0]),
+            bytes([INTERACTION, 64, 28, 0]),
+            bytes([INTERACTION, 12, 64, 0]),
+            bytes([INTERACTION, 8, 0, KING]),
+            bytes([INTERACTION, 8, 0, 9]),
+        ):
+            with self.subTest(frame=frame):
+                with self.assertRaises(ValueError):
+                    decode_message(frame)
+
+    def test_interaction_round_trip(self):
+        for data in (
+            {"source": 52, "target": 36, "color": ChessPieceColor.WHITE},
+            {
+                "source": 49,
+                "target": 57,
+                "color": ChessPieceColor.BLACK,
+                "promotion": ChessPieceType.KNIGHT,
+            },
+        ):
+            with self.subTest(data=data):
+                kind, source, target, promotion, color, seq = INTERACTION_FRAME.unpack(
+                    encode_interaction(data, 7)
+                )
+                self.assertEqual(
+                    (kind, color, seq),
+                    (INTERACTION, data["color"] == ChessPieceColor.BLACK, 7),
+                )
+
+                # what a client echoing the move back would send
+                message = decode_message(bytes([kind, source, target, promotion]))
+                self.assertEqual(
+                    message["data"],
+                    {key: value for key, value in data.items() if key != "color"},
+                )
+
+    def test_state(self):
+        board = Board.fromFen(START_FEN)
+        board.turn = ChessPieceColor.BLACK
+        kind, squares, turn, seq = STATE_FRAME.unpack(encode_state(board, 42))
+        self.assertEqual(
+            (kind, squares, turn, seq), (STATE, bytes(board.squares), 1, 42)
+        )
+
+
+def board_state(board: Board) -> tuple:
+    return (
+        bytes(board.squares),
+        board.turn,
+        board.castling,
+        board.epSquare,
+        board.halfmoveClock,
+        board.hash,
+        bytes(board.attacks[0]),
+        bytes(board.attacks[1]),
+    )
+
+
+class MoveGenerationTests(SimpleTestCase):
+    def test_perft(self):
+        for name, fen, expected in PERFT_POSITIONS:
+            board = Board.fromFen(fen)
+            # depth 3 only for the smaller trees, to keep the test fast
+            for depth, nodes in enumerate(expected[:3], 1):
+                if depth == 3 and nodes > 10000:
+                    break
+                with self.subTest(position=name, depth=depth):
+                    self.assertEqual(board.perft(depth), nodes)
+
+    def test_unmake_restores_board(self):
+        def walk(board: Board, depth: int):
+            before = board_state(board)
+            for move in board.generateLegalMoves():
+                board.makeMove(move)
+                # the incremental hash equals the one computed from scratch
+                hash = board.hash
+                board.rebuildHash()
+                self.assertEqual(hash, board.hash, f"{move.uci()} to {board.toFen()}")
+                if depth > 1:
+                    walk(board, depth - 1)
+                board.unmakeMove()
+                self.assertEqual(before, board_state(board), move.uci())
+
+        for name, fen, expected in PERFT_POSITIONS:
+            with self.subTest(position=name):
+                walk(Board.fromFen(fen), 2)
+
+    def test_equal_positions_get_equal_hashes(self):
+        for moves, fen in (
+            # no pawn can take on e3
+            (["e2e4"], "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"),
+            # the pawn on d4 can
+            (
+                ["d2d4", "g8f6", "d4d5", "e7e5"],
+                "rnbqkb1r/pppp1ppp/5n2/3Pp3/8/8/PPP1PPPP/RNBQKBNR w KQkq e6 0 3",
+            ),
+        ):
+            with self.subTest(fen=fen):
+                board = Board.fromFen(START_FEN)
+                for uci in moves:
+                    board.makeMove(Move.fromUci(uci))
+                parsed = Board.fromFen(fen)
+                self.assertEqual(parsed.epSquare, board.epSquare)
+                self.assertEqual(parsed.hash, board.hash)
+
+
+def play(board: Board, *moves: str) -> Board:
+    for uci in moves:
+        board.makeMove(Move.fromUci(uci))
+    return board
+
+
+class PersistenceTests(TestCase):
+    def setUp(self):
+        self.chess_match = create_match(1)
+        self.write_behind = WriteBehind(60, 3)
+
+    def record(self, board: Board, *moves: str):
+        for uci in moves:
+            play(board, uci)
+            self.write_behind.record(self.chess_match.id, board)
+
+    def test_snapshot_and_replay(self):
+        board = Board.fromFen(START_FEN)
+        self.record(board, "e2e4", "e7e5", "g1f3", "b8c6", "f1b5")
+        self.write_behind.flush()
+
+        self.chess_match.refresh_from_db()
+        # the snapshot of ply 3 and the two moves after it
+        self.assertEqual(Board.unpack(bytes(self.chess_match.position)).ply, 3)
+        self.assertEqual(load_board(self.chess_match).toFen(), board.toFen())
+
+    def test_replay_stops_at_gaps_and_illegal_moves(self):
+        board = Board.fromFen(START_FEN)
+        self.record(board, "e2e4", "e7e5")
+        self.write_behind.flush()
+        expected = board.toFen()
+
+        for ply, uci in ((4, "g1f3"), (3, "e4e5")):  # a gap, then an illegal move
+            with self.subTest(ply=ply):
+                move = Move.fromUci(uci)
+                MoveModel.objects.create(
+                    chess_match=self.chess_match,
+                    ply=ply,
+                    source=move.source,
+                    target=move.target,
+                )
+                with self.assertLogs(level="ERROR"):
+                    self.assertEqual(load_board(self.chess_match).toFen(), expected)
+
+    def test_conflicting_moves_do_not_block_the_room(self):
+        board = Board.fromFen(START_FEN)
+        self.record(board, "e2e4", "e7e5")
+        # another process logged the second ply first
+        MoveModel.objects.create(
+            chess_match=self.chess_match, ply=2, source=11, target=27
+        )
+
+        with self.assertLogs(level="ERROR"):
+            self.write_behind.flush()
+        self.record(board, "g1f3")
+        self.write_behind.flush()
+
+        self.assertEqual(self.write_behind.pending, {})
+        self.assertEqual(
+            list(self.chess_match.moves.order_by("ply").values_list("ply", "source")),
+            [(1, 52), (2, 11), (3, 62)],
+        )
+
+
+class RoomTests(SimpleTestCase):
+    def test_relayed_moves_are_validated(self):
+        room = Room(1, Board.fromFen(START_FEN))
+        # not legal in the room's position
+        self.assertFalse(room.apply("a", Move.fromUci("e2e5"), 1))
+        # not the next move
+        self.assertFalse(room.apply("b", Move.fromUci("e2e4"), 2))
+        self.assertEqual(room.seq, 0)
+
+        self.assertTrue(room.apply("c", Move.fromUci("e2e4"), 1))
+        self.assertFalse(room.apply("c", Move.fromUci("e2e4"), 1))  # seen before
+        self.assertEqual(room.seq, 1)
+
+    def test_missed_moves(self):
+        room = Room(1, Board.fromFen(START_FEN))
+        room.recent = deque(maxlen=2)
+        for seq, uci in enumerate(("e2e4", "e7e5", "g1f3"), 1):
+            room.apply(uci, Move.fromUci(uci), seq)
+            room.remember(seq, {"move": uci})
+
+        self.assertEqual(room.missed(3), [])
+        self.assertEqual(room.missed(2), [(3, {"move": "g1f3"})])
+        self.assertEqual(room.missed(1), [(2, {"move": "e7e5"}), (3, {"move": "g1f3"})])
+        # no longer remembered, or ahead of the room: the client needs the state
+        self.assertIsNone(room.missed(0))
+        self.assertIsNone(room.missed(4))
+
+
+@override_settings(
+    CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+)
+class LobbyTests(TestCase):
+    # the views are called without the middleware, which needs a SECRET_KEY
+    def setUp(self):
+        cache.clear()
+        self.factory = APIRequestFactory()
+
+    def listed(self, query: str = "") -> list:
+        response = ChessMatchList.as_view()(
+            self.factory.get(f"/api/chess/rooms{query}")
+        )
+        return [room["id"] for room in response.data["results"]]
+
+    def test_cached_page_is_invalidated(self):
+        self.assertEqual(self.listed(), [])
+        self.assertEqual(self.listed("?open=W"), [])
+
+        # creating a room and claiming a seat each show on the cached pages
+        ChessMatchDetail.as_view()(self.factory.post("/api/chess/rooms/5"), id=5)
+        self.assertEqual(self.listed(), [5])
+        self.assertEqual(self.listed("?open=W"), [5])
+
+        # as ChessMatchRole claims a seat
+        chess_match = ChessMatchModel.objects.get(id=5)
+        chess_match.white = "session"
+        chess_match.save()
+        seats_claimed(chess_match)
+        self.assertEqual(self.listed("?open=W"), [])
+        self.assertEqual(self.listed("?open=B"), [5])
+
+
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        for name, plan in query_plans().items():
+            with self.subTest(query=name):
+                self.assertIsNone(FULL_SCAN.search(plan), plan)
+
+
+class MoveValidationTests(SimpleTestCase):
+    def validate(self, body: dict):
+        request = APIRequestFactory().post("/api/chess/validate", body, format="json")
+        return MoveValidation.as_view()(request)
+
+    def test_lines(self):
+        response = self.validate({"moves": ["e2e4", "e7e5", "e1e3"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            (response.data["valid"], response.data["illegal_ply"]), (False, 3)
+        )
+
+    def test_impossible_positions_are_rejected(self):
+        for fen in (
+            "8/8/8/8/8/8/8/p3K2k b - - 0 1",  # a pawn on the first row
+            "4k3/8/8/8/8/8/8/8 w KQ - 0 1",  # no white king
+            "4k3/9/8/8/8/8/8/4K3 w - - 0 1",  # a row too long
+        ):
+            with self.subTest(fen=fen):
+                response = self.validate({"fen": fen, "moves": []})
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn("Invalid FEN: Invalid FEN", str(response.data))
+
+    def test_batch_size_is_limited(self):
+        games = [{"moves": ["e2e4"] * 1000}] * (MAX_VALIDATED_BATCH_PLIES // 1000 + 1)
+        self.assertEqual(self.validate({"games": games}).status_code, 400)
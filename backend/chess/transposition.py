@@ -0,0 +1,81 @@
+from typing import Final, List, NamedTuple, Union
+
+# kind of score stored for a position
+EXACT: Final = 0
+LOWER_BOUND: Final = 1  # the search failed high, the score is at least this
+UPPER_BOUND: Final = 2  # the search failed low, the score is at most this
+
+
+class TranspositionEntry(NamedTuple):
+    key: int
+    depth: int
+    score: int
+    flag: int
+    move: object
+    generation: int
+
+
+class TranspositionTable:
+    # Fixed size cache of search results keyed by Board.hash.
+    # Every slot has two tiers: a depth-preferred entry that is only replaced by deeper
+    # searches or once it is left over from an earlier search, and an always-replace
+    # entry that keeps the most recent result. The size is rounded to a power of two so
+    # that the slot is a mask of the key.
+
+    def __init__(self, size: int = 1 << 16):
+        self.size: int = 1 << max(size - 1, 1).bit_length()
+        self.mask: int = self.size - 1
+        self.generation: int = 0
+        self.deep: List[Union[TranspositionEntry, None]] = [None] * self.size
+        self.recent: List[Union[TranspositionEntry, None]] = [None] * self.size
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def new_search(self):
+        # entries of earlier searches become the first to be replaced
+        self.generation += 1
+
+    def clear(self):
+        self.deep = [None] * self.size
+        self.recent = [None] * self.size
+        self.generation = self.hits = self.misses = 0
+
+    def probe(self, key: int) -> Union[TranspositionEntry, None]:
+        i = key & self.mask
+
+        entry = self.deep[i]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+
+        entry = self.recent[i]
+        if entry is not None and entry.key == key:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, score: int, flag: int, move=None):
+        i = key & self.mask
+        entry = TranspositionEntry(key, depth, score, flag, move, self.generation)
+        deep = self.deep[i]
+
+        if (
+            deep is None
+            or deep.key == key
+            or deep.generation != self.generation
+            or depth >= deep.depth
+        ):
+            if deep is not None and deep.key == key and move is None:
+                entry = entry._replace(move=deep.move)  # keep the known best move
+            elif deep is not None and deep.key != key:
+                self.recent[i] = deep  # the displaced entry is still worth a probe
+            self.deep[i] = entry
+        else:
+            self.recent[i] = entry
+
+    def __len__(self) -> int:
+        return sum(entry is not None for entry in self.deep) + sum(
+            entry is not None for entry in self.recent
+        )
@@ -23,6 +23,7 @@ urlpatterns = [
     path("api/chess/rooms", views.ChessMatchList.as_view()),
     path("api/chess/rooms/<int:id>", views.ChessMatchDetail.as_view()),
     path("api/chess/rooms/<int:id>/role", views.ChessMatchRole.as_view()),
+    path("api/chess/validate", views.MoveValidation.as_view()),
 ]
 
 urlpatterns = format_suffix_patterns(urlpatterns)
@@ -1,71 +1,79 @@
-import logging
 from rest_framework.views import APIView
 from django.http import Http404
 from rest_framework.response import Response
 from rest_framework import status, generics
-
-from chess.models import ChessMatchModel, ChessPieceType, ChessPieceColor, PlayerRole
-from chess.serializers import ChessMatchSerializer, ChessMatchInfoSerializer
-
-default_board_pieces = (
-    [
-        {"pos": pos, "type": ChessPieceType.PAWN, "color": ChessPieceColor.BLACK}
-        for pos in range(8, 16)
-    ]
-    + [
-        {"pos": pos, "type": ChessPieceType.PAWN, "color": ChessPieceColor.WHITE}
-        for pos in range(48, 56)
-    ]
-    + [
-        {"pos": pos, "type": ChessPieceType.ROOK, "color": ChessPieceColor.BLACK}
-        for pos in (0, 7)
-    ]
-    + [
-        {"pos": pos, "type": ChessPieceType.ROOK, "color": ChessPieceColor.WHITE}
-        for pos in (56, 63)
-    ]
-    + [
-        {
-            "pos": pos,
-            "type": ChessPieceType.KNIGHT,
-            "color": ChessPieceColor.BLACK,
-        }
-        for pos in (1, 6)
-    ]
-    + [
-        {
-            "pos": pos,
-            "type": ChessPieceType.KNIGHT,
-            "color": ChessPieceColor.WHITE,
-        }
-        for pos in (57, 62)
-    ]
-    + [
-        {
-            "pos": pos,
-            "type": ChessPieceType.BISHOP,
-            "color": ChessPieceColor.BLACK,
-        }
-        for pos in (2, 5)
-    ]
-    + [
-        {
-            "pos": pos,
-            "type": ChessPieceType.BISHOP,
-            "color": ChessPieceColor.WHITE,
-        }
-        for pos in (58, 61)
-    ]
-    + [{"pos": 3, "type": ChessPieceType.QUEEN, "color": ChessPieceColor.BLACK}]
-    + [{"pos": 59, "type": ChessPieceType.QUEEN, "color": ChessPieceColor.WHITE}]
-    + [{"pos": 4, "type": ChessPieceType.KING, "color": ChessPieceColor.BLACK}]
-    + [{"pos": 60, "type": ChessPieceType.KING, "color": ChessPieceColor.WHITE}]
+from rest_framework.pagination import CursorPagination
+from django.db import IntegrityError
+from django.db.models import Q
+from django.utils import timezone
+from datetime import timedelta
+from typing import List
+
+from chess.models import ChessMatchModel, ChessPieceColor, PlayerRole
+from chess.serializers import (
+    ChessMatchInfoSerializer,
+    MoveBatchSerializer,
+    MoveSequenceSerializer,
 )
+from chess.game_logic import Board, Move
+from chess.provisioning import claim_pooled_match, create_match
+from chess.lobby import cached_first_page, invalidate_lobby
+from chess.fanout import group_name, seats_message
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+
+class ChessMatchPagination(CursorPagination):
+    # keyset pagination, the cost of a page does not grow with the number of matches
+    ordering = ("-last_accessed", "-id")
 
 
 class ChessMatchList(generics.ListAPIView):
-    queryset = ChessMatchModel.objects.all()
+    # Query parameters:
+    # open: W, B or any, only matches with that seat still free
+    # active_within: only matches accessed within this many seconds
     serializer_class = ChessMatchInfoSerializer
+    pagination_class = ChessMatchPagination
+
+    def get_queryset(self):
+        queryset = ChessMatchModel.objects.filter(pooled=False, archived=False)
+
+        open_seat = self.request.query_params.get("open")
+        if open_seat == ChessPieceColor.WHITE:
+            queryset = queryset.filter(white__isnull=True).exclude(
+                engine=ChessPieceColor.WHITE
+            )
+        elif open_seat == ChessPieceColor.BLACK:
+            queryset = queryset.filter(black__isnull=True).exclude(
+                engine=ChessPieceColor.BLACK
+            )
+        elif open_seat == "any":
+            queryset = queryset.filter(
+                Q(white__isnull=True, engine__isnull=True)
+                | Q(black__isnull=True, engine__isnull=True)
+                | Q(white__isnull=True, engine=ChessPieceColor.BLACK)
+                | Q(black__isnull=True, engine=ChessPieceColor.WHITE)
+            )
+
+        active_within = self.request.query_params.get("active_within", "")
+        if active_within.isdigit():
+            queryset = queryset.filter(
+                last_accessed__gte=timezone.now()
+                - timedelta(seconds=int(active_within))
+            )
+
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params.get(self.paginator.cursor_query_param):
+            return super().list(request, *args, **kwargs)
+
+        return Response(
+            cached_first_page(
+                request.build_absolute_uri(),
+                lambda: super(ChessMatchList, self).list(request, *args, **kwargs).data,
+            )
+        )
 
 
 class ChessMatchDetail(APIView):
@@ -78,20 +86,87 @@ class ChessMatchDetail(APIView):
         return Response(serializer.data)
 
     def post(self, request, id, format=None):
-        if ChessMatchModel.objects.filter(pk=id).exists():
+        # ?engine=W or ?engine=B creates a game against the computer playing that color
+        engine = request.query_params.get("engine")
+        if engine is not None and engine not in ChessPieceColor.values:
             return Response(
-                "Chess match already exists. Overwriting is forbidden.",
-                status=status.HTTP_403_FORBIDDEN,
+                "Specify the engine's color.", status=status.HTTP_400_BAD_REQUEST
             )
 
-        data = {"id": id, "pieces": default_board_pieces}
-        serializer = ChessMatchSerializer(data=data)
-        if serializer.is_valid():
-            serializer.save()
-            serializer = ChessMatchInfoSerializer(serializer.instance)
-            return Response(serializer.data)
-        logging.error(serializer.errors)
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        chess_match = claim_pooled_match(id, engine)
+
+        if chess_match is None:
+            try:
+                chess_match = create_match(id, engine)
+            except IntegrityError:
+                return Response(
+                    "Chess match already exists. Overwriting is forbidden.",
+                    status=status.HTTP_403_FORBIDDEN,
+                )
+
+        serializer = ChessMatchInfoSerializer(chess_match)
+        return Response(serializer.data)
+
+
+def replay_line(fen: str, moves: List[str]) -> dict:
+    # applies the UCI moves in memory, stopping at the first illegal one
+    board = Board.fromFen(fen)
+    positions = list()
+
+    for ply, uci in enumerate(moves, 1):
+        try:
+            move = Move.fromUci(uci)
+        except (ValueError, IndexError):
+            move = None
+        if move not in board.generatePseudoMoves() or not board.isLegal(move):
+            return {
+                "valid": False,
+                "illegal_ply": ply,
+                "move": uci,
+                "fen": board.toFen(),
+                "positions": positions,
+            }
+        board.makeMove(move)
+        positions.append(board.toFen())
+
+    return {"valid": True, "fen": board.toFen(), "positions": positions}
+
+
+class MoveValidation(APIView):
+    # Checks lines of moves against the rules without touching the database. The
+    # body is {"fen": ..., "moves": ["e2e4", ...]}, the FEN defaults to the starting
+    # position, or {"games": [...]} with many such lines. Every line is answered with
+    # the position after each of its moves, or with its first illegal ply.
+    def post(self, request, format=None):
+        if "games" in request.data:
+            serializer = MoveBatchSerializer(data=request.data)
+        else:
+            serializer = MoveSequenceSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        if "games" in serializer.validated_data:
+            return Response(
+                {
+                    "games": [
+                        replay_line(line["fen"], line["moves"])
+                        for line in serializer.validated_data["games"]
+                    ]
+                }
+            )
+        return Response(
+            replay_line(
+                serializer.validated_data["fen"], serializer.validated_data["moves"]
+            )
+        )
+
+
+def seats_claimed(chess_match: ChessMatchModel):
+    invalidate_lobby()
+    # connections to the room check seats in memory, they learn about it from here
+    async_to_sync(get_channel_layer().group_send)(
+        group_name(chess_match.id), seats_message(chess_match)
+    )
 
 
 class ChessMatchRole(APIView):
@@ -139,6 +214,21 @@ class ChessMatchRole(APIView):
                 status=status.HTTP_403_FORBIDDEN,
             )
 
+        if chess_match.archived:
+            return Response(
+                "Archived matches cannot be played.",
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
+        if (
+            chess_match.engine is not None
+            and request.query_params.get("color") == chess_match.engine
+        ):
+            return Response(
+                "Player color is played by the engine.",
+                status=status.HTTP_403_FORBIDDEN,
+            )
+
         if request.query_params.get("color") == ChessPieceColor.BLACK:
             if chess_match.black is not None:
                 return Response(
@@ -147,6 +237,7 @@ class ChessMatchRole(APIView):
                 )
             chess_match.black = request.session.session_key
             chess_match.save()
+            seats_claimed(chess_match)
             return Response(status=status.HTTP_200_OK)
         elif request.query_params.get("color") == ChessPieceColor.WHITE:
             if chess_match.white is not None:
@@ -156,6 +247,7 @@ class ChessMatchRole(APIView):
                 )
             chess_match.white = request.session.session_key
             chess_match.save()
+            seats_claimed(chess_match)
             return Response(status=status.HTTP_200_OK)
         else:
             return Response(
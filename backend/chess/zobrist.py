@@ -0,0 +1,32 @@
+import random
+from functools import reduce
+from typing import Final
+
+# Random keys for Zobrist hashing. A position's hash is the XOR of the keys of its
+# pieces, castling rights, en passant file and side to move, so the Board can update
+# it with one XOR per change. The fixed seed keeps hashes stable across processes and
+# restarts, which anything stored by hash relies on.
+
+_random = random.Random(0x5EEDC4E55)
+
+# PIECE_KEYS[code][pos], the row of the empty code is all zeros
+PIECE_KEYS: Final = tuple(
+    tuple(_random.getrandbits(64) if code else 0 for pos in range(64))
+    for code in range(16)
+)
+
+_RIGHT_KEYS: Final = tuple(_random.getrandbits(64) for right in range(4))
+
+# CASTLING_KEYS[rights] for every combination of the four castling right flags
+CASTLING_KEYS: Final = tuple(
+    reduce(
+        lambda key, i: key ^ _RIGHT_KEYS[i] if rights & (1 << i) else key, range(4), 0
+    )
+    for rights in range(16)
+)
+
+# indexed by the file of the en passant field
+EP_KEYS: Final = tuple(_random.getrandbits(64) for file in range(8))
+
+# toggled when black is to move
+SIDE_KEY: Final = _random.getrandbits(64)
@@ -2,7 +2,8 @@ import { PieceColor, PlayerRole, PieceType } from "./ChessClasses";
 
 interface ChessWSMessage {
     type: string,
-    data: InteractionEvent | MatchStateEvent
+    data: InteractionEvent | MatchStateEvent,
+    seq?: number,
 }
 
 export interface InteractionEvent {
@@ -34,6 +35,7 @@ export class ChessSocket {
     protected _isOpen: boolean = false;
     protected roomID: number
     protected backOffTime: number
+    protected lastSeq: number | null = null; // sequence number of the last received move
     protected interactionSubscribersAll: Array<Interactioncb>
     protected interactionSubscribersWhite: Array<Interactioncb>
     protected interactionSubscribersBlack: Array<Interactioncb>
@@ -67,7 +69,9 @@ export class ChessSocket {
 
     protected connect = (): void => {
         let chessSocket: ChessSocket = this;
-        this.socket = new WebSocket(`ws://localhost:8000/ws/chess/room/${this.roomID}`);
+        // after a reconnect the server only sends the moves we missed
+        const resume = this.lastSeq === null ? '' : `?last_seq=${this.lastSeq}`;
+        this.socket = new WebSocket(`ws://localhost:8000/ws/chess/room/${this.roomID}${resume}`);
         this.socket.onclose = function (e: Event): void {
             chessSocket.isOpen = false;
             console.log('Chess socket closed.');
@@ -80,6 +84,9 @@ export class ChessSocket {
         this.socket.onmessage = function (e: MessageEvent): void {
             const msg: ChessWSMessage = JSON.parse(e.data);
 
+            if (msg.seq !== undefined)
+                chessSocket.lastSeq = msg.seq;
+
             if (msg.type === 'state') {
                 let stateEvent: MatchStateEvent = msg.data as MatchStateEvent;
                 chessSocket.matchStateSubscribers.forEach(cb => cb(stateEvent));